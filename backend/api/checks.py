@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_cache_shared(alias='default'):
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    return backend not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if is_cache_shared():
+        return []
+    return [Warning(
+        'Кэш по умолчанию не разделяется между процессами.',
+        hint=(
+            'Версии снимков, кэш ответов, фрагменты рецептов и токены '
+            'хранятся в кэше по умолчанию. При нескольких воркерах '
+            'задайте REDIS_URL.'
+        ),
+        id='api.W001',
+    )]
@@ -1,6 +1,35 @@
+from django import forms
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Exists, F, OuterRef
 from django_filters.rest_framework import FilterSet, filters
+from rest_framework.filters import OrderingFilter, SearchFilter
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import SEARCH_CONFIG, Ingredient, Recipe, Tag
+from .snapshots import get_version
+
+TAG_IDS_KEY = 'tags:ids:{}'
+
+
+def get_tag_ids():
+    key = TAG_IDS_KEY.format(get_version('tags'))
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids)
+    return tag_ids
+
+
+class SlugListField(forms.Field):
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        return [str(item) for item in value or ()]
+
+
+class SlugListFilter(filters.Filter):
+    field_class = SlugListField
 
 
 class IngredientSearchFilter(FilterSet):
@@ -12,7 +41,11 @@ class IngredientSearchFilter(FilterSet):
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = SlugListFilter(method='filter_tags')
+    tags_mode = filters.ChoiceFilter(
+        choices=(('any', 'any'), ('all', 'all')),
+        method='filter_tags_mode'
+    )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
@@ -20,7 +53,32 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'tags_mode', 'author',
+                  'is_favorited', 'is_in_shopping_cart')
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        tag_ids = get_tag_ids()
+        ids = {tag_ids.get(slug) for slug in value}
+        if self.form.cleaned_data.get('tags_mode') == 'all':
+            if None in ids:
+                return queryset.none()
+            groups = [[tag_id] for tag_id in ids]
+        else:
+            ids.discard(None)
+            if not ids:
+                return queryset.none()
+            groups = [ids]
+        for group in groups:
+            queryset = queryset.filter(Exists(
+                Recipe.tags.through.objects.filter(
+                    tag_id__in=group, recipe_id=OuterRef('pk'))
+            ))
+        return queryset
+
+    def filter_tags_mode(self, queryset, name, value):
+        return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         if value:
@@ -31,3 +89,30 @@ class RecipeFilter(FilterSet):
         if value:
             return queryset.filter(cart__user=self.request.user)
         return queryset
+
+
+class RecipeSearchFilter(SearchFilter):
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, '').strip()
+        if not terms or connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+        query = SearchQuery(
+            terms, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date')
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    tiebreakers = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        fields = {field.lstrip('-') for field in ordering}
+        return [*ordering, *(
+            field for field in self.tiebreakers
+            if field.lstrip('-') not in fields
+        )]
@@ -0,0 +1,28 @@
+import time
+
+from django.core.cache import cache
+
+FRAGMENT_KEY = 'recipe_fragment:3:{}:{}'
+FRAGMENT_VERSION_KEY = 'recipe_fragment_version:{}'
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+def get_fragment_versions(recipe_ids):
+    keys = {pk: FRAGMENT_VERSION_KEY.format(pk) for pk in recipe_ids}
+    versions = cache.get_many(keys.values())
+    for key in set(keys.values()) - versions.keys():
+        cache.add(key, time.time_ns(), timeout=FRAGMENT_TIMEOUT)
+        versions[key] = cache.get(key)
+    return {pk: versions[key] for pk, key in keys.items()}
+
+
+def get_fragment_keys(recipe_ids):
+    return {
+        pk: FRAGMENT_KEY.format(pk, version)
+        for pk, version in get_fragment_versions(recipe_ids).items()
+    }
+
+
+def invalidate_recipe_fragments(recipe_ids):
+    cache.delete_many(
+        [FRAGMENT_VERSION_KEY.format(pk) for pk in recipe_ids])
@@ -0,0 +1,266 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+from functools import partial
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from recipes.management.commands.seed_benchmark_data import (
+    BENCHMARK_PASSWORD)
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Subscription, User
+
+BENCHMARK_IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0'
+    'lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII='
+)
+
+
+def get_recipe_data(user):
+    return {
+        'ingredients': [
+            {'id': ingredient_id, 'amount': 10 * (i + 1)}
+            for i, ingredient_id in enumerate(Ingredient.objects.values_list(
+                'id', flat=True)[:8])
+        ],
+        'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+        'name': f'Рецепт {user.username}',
+        'text': 'Описание рецепта',
+        'cooking_time': 30,
+    }
+
+
+def get_endpoints(user):
+    recipe = Recipe.objects.order_by('-pub_date').first()
+    other = Recipe.objects.exclude(
+        favorites__user=user).exclude(cart__user=user).first()
+    author = User.objects.exclude(
+        following__user=user).exclude(id=user.id).first()
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    tag = Tag.objects.first()
+    ingredient = Ingredient.objects.first()
+    subscription = Subscription.objects.filter(user=user).first()
+    own = Recipe.objects.filter(author=user).first()
+    favorites = list(Favorite.objects.filter(
+        user=user).values_list('recipe_id', flat=True)[:10])
+    cart = list(ShoppingCart.objects.filter(
+        user=user).values_list('recipe_id', flat=True)[:10])
+    others = list(Recipe.objects.exclude(favorites__user=user).exclude(
+        cart__user=user).values_list('id', flat=True)[:10])
+    recipe_data = get_recipe_data(user)
+    recipes = reverse('api:recipes-list')
+    return {
+        'users-list': ('get', reverse('api:users_list-list'), {}),
+        'users-detail': ('get', reverse(
+            'api:users_list-detail', args=(author.id,)), {}),
+        'users-me': ('get', reverse('api:users_list-me'), {}),
+        'users-create': ('post', reverse('api:users_list-list'), {
+            'email': 'bench_new@foodgram.ru',
+            'username': 'bench_new',
+            'first_name': 'Имя',
+            'last_name': 'Фамилия',
+            'password': BENCHMARK_PASSWORD,
+        }, False),
+        'auth-token-login': ('post', reverse('api:login'), {
+            'email': user.email, 'password': BENCHMARK_PASSWORD}, False),
+        'auth-token-logout': ('post', reverse('api:logout'), {}),
+        'users-subscriptions': ('get', reverse('api:subscriptions'),
+                                {'recipes_limit': 3}),
+        'users-subscribe': ('post', reverse(
+            'api:subscribe', args=(author.id,)), {}),
+        'users-unsubscribe': ('delete', reverse(
+            'api:subscribe', args=(subscription.author_id,)), {}),
+        'tags-list': ('get', reverse('api:tags-list'), {}),
+        'tags-detail': ('get', reverse('api:tags-detail', args=(tag.id,)),
+                        {}),
+        'ingredients-list': ('get', reverse('api:ingredients-list'), {}),
+        'ingredients-search': ('get', reverse('api:ingredients-list'),
+                               {'name': ingredient.name[:2]}),
+        'ingredients-detail': ('get', reverse(
+            'api:ingredients-detail', args=(ingredient.id,)), {}),
+        'recipes-list': ('get', recipes, {}),
+        'recipes-list-anonymous': ('get', recipes, {}, False),
+        'recipes-list-limit-50': ('get', recipes, {'limit': 50}),
+        'recipes-list-tags': ('get', recipes, {'tags': tag.slug}),
+        'recipes-list-tags-any': ('get', recipes, {'tags': tags}),
+        'recipes-list-tags-all': ('get', recipes,
+                                  {'tags': tags, 'tags_mode': 'all'}),
+        'recipes-list-favorited': ('get', recipes, {'is_favorited': 1}),
+        'recipes-list-author': ('get', recipes, {'author': author.id}),
+        'recipes-list-cursor': ('get', recipes, {'cursor': ''}),
+        'recipes-feed': ('get', reverse('api:recipes-feed'), {}),
+        'recipes-search': ('get', recipes, {'search': recipe.name}),
+        'recipes-detail': ('get', reverse(
+            'api:recipes-detail', args=(recipe.id,)), {}),
+        'recipes-create': ('post', recipes,
+                           dict(recipe_data, image=BENCHMARK_IMAGE)),
+        'recipes-update': ('patch', reverse(
+            'api:recipes-detail', args=(own.id,)), recipe_data),
+        'recipes-delete': ('delete', reverse(
+            'api:recipes-detail', args=(own.id,)), {}),
+        'recipes-favorite': ('post', reverse(
+            'api:recipes-favorite', args=(other.id,)), {}),
+        'recipes-unfavorite': ('delete', reverse(
+            'api:recipes-favorite', args=(favorites[0],)), {}),
+        'recipes-favorite-batch-add': ('post', reverse(
+            'api:recipes-favorite-batch'), {'recipes': others}),
+        'recipes-favorite-batch-remove': ('delete', reverse(
+            'api:recipes-favorite-batch'), {'recipes': favorites}),
+        'recipes-shopping-cart': ('post', reverse(
+            'api:recipes-shopping-cart', args=(other.id,)), {}),
+        'recipes-shopping-cart-remove': ('delete', reverse(
+            'api:recipes-shopping-cart', args=(cart[0],)), {}),
+        'recipes-shopping-cart-batch-add': ('post', reverse(
+            'api:recipes-shopping-cart-batch'), {'recipes': others}),
+        'recipes-shopping-cart-batch-remove': ('delete', reverse(
+            'api:recipes-shopping-cart-batch'), {'recipes': cart}),
+        'recipes-download-shopping-cart': ('get', reverse(
+            'api:recipes-download-shopping-cart'), {}),
+    }
+
+
+BASELINE_PATH = os.path.join(
+    settings.BASE_DIR, 'data', 'benchmark_baseline.json')
+BENCHMARK_THROTTLE_STORE = {'BACKEND': 'api.throttling.DummyCounterStore'}
+
+
+class ClientSender:
+
+    def __init__(self, token):
+        self.clients = {
+            True: Client(HTTP_AUTHORIZATION=f'Token {token.key}'),
+            False: Client(),
+        }
+
+    def __call__(self, authenticated, method, url, params):
+        client = self.clients[authenticated]
+        if method == 'get':
+            return client.get(url, params)
+        return getattr(client, method)(
+            url, params, content_type='application/json')
+
+
+class ASGISender:
+
+    def __init__(self, token):
+        self.client = AsyncClient()
+        self.headers = {
+            True: {'AUTHORIZATION': f'Token {token.key}'},
+            False: {},
+        }
+
+    def __call__(self, authenticated, method, url, params):
+        return async_to_sync(self.send)(authenticated, method, url, params)
+
+    async def send(self, authenticated, method, url, params):
+        headers = self.headers[authenticated]
+        if method == 'get':
+            return await self.client.get(url, params, **headers)
+        return await getattr(self.client, method)(
+            url, params, content_type='application/json', **headers)
+
+
+class Command(BaseCommand):
+    help = 'measuring API latency and query counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', default=30, type=int)
+        parser.add_argument('--warmup', default=3, type=int)
+        parser.add_argument('--user', default='bench_0',
+                            help='username of the requesting user')
+        parser.add_argument('--output', help='path to save results as JSON')
+        parser.add_argument('--baseline',
+                            help='path to JSON results to compare with, '
+                                 f'e.g. {BASELINE_PATH}')
+        parser.add_argument('--tolerance', default=0.25, type=float,
+                            help='allowed relative p95 slowdown')
+        parser.add_argument('--asgi', action='store_true',
+                            help='send requests through the ASGI handler')
+
+    def measure(self, send, method, url, params, iterations, warmup):
+        timings = []
+        queries = 0
+        for i in range(warmup + iterations):
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    response = send(method, url, params)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = (time.perf_counter() - start) * 1000
+                transaction.set_rollback(True)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{method.upper()} {url}: {response.status_code}')
+            if i >= warmup:
+                timings.append(elapsed)
+                queries = max(queries, len(context.captured_queries))
+        percentiles = statistics.quantiles(timings, n=100)
+        return {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentiles[94], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'queries': queries,
+        }
+
+    def compare(self, results, baseline, tolerance):
+        failures = []
+        for name, budget in baseline.items():
+            result = results.get(name)
+            if result is None:
+                continue
+            if result['queries'] > budget['queries']:
+                failures.append(
+                    f'{name}: запросов {result["queries"]} '
+                    f'> {budget["queries"]}')
+            if 'p95_ms' not in budget:
+                continue
+            if result['p95_ms'] > budget['p95_ms'] * (1 + tolerance):
+                failures.append(
+                    f'{name}: p95 {result["p95_ms"]} мс '
+                    f'> {budget["p95_ms"]} мс')
+        return failures
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError('Сначала выполните seed_benchmark_data.')
+        token, _ = Token.objects.get_or_create(user=user)
+        sender_class = ASGISender if options['asgi'] else ClientSender
+        send = sender_class(token)
+        with tempfile.TemporaryDirectory() as media, override_settings(
+                MEDIA_ROOT=media, THROTTLE_STORE=BENCHMARK_THROTTLE_STORE):
+            results = self.run(send, user, options)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+        if options['baseline']:
+            with open(options['baseline'], 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            failures = self.compare(results, baseline, options['tolerance'])
+            if failures:
+                raise CommandError('\n'.join(failures))
+
+    def run(self, send, user, options):
+        results = {}
+        for name, (method, url, params, *auth) in get_endpoints(
+                user).items():
+            results[name] = self.measure(
+                partial(send, auth[0] if auth else True), method, url, params,
+                options['iterations'], options['warmup'])
+            self.stdout.write(
+                f'{name:32} p50 {results[name]["p50_ms"]:8.2f} мс  '
+                f'p95 {results[name]["p95_ms"]:8.2f} мс  '
+                f'запросов {results[name]["queries"]}'
+            )
+        return results
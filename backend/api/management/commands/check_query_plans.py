@@ -0,0 +1,136 @@
+import json
+import re
+import tempfile
+from functools import partial
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+from .benchmark_api import (BENCHMARK_THROTTLE_STORE, ClientSender,
+                            get_endpoints)
+
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+EXPECTED_SCANS = {
+    'ingredients-list:recipes_ingredient',
+    'ingredients-search:recipes_ingredient',
+}
+SQLITE_EXPECTED_SCANS = {'recipes-search:recipes_recipe'}
+PLAN_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'query-plans',
+    },
+}
+
+
+class SelectRecorder:
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def get_table_sizes():
+    return {
+        model._meta.db_table: model._default_manager.count()
+        for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed
+    }
+
+
+def iter_pg_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from iter_pg_nodes(child)
+
+
+def get_scanned_tables(sql, params):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return {
+                node['Relation Name']
+                for node in iter_pg_nodes(plan[0]['Plan'])
+                if node['Node Type'] == 'Seq Scan'
+            }
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return {
+            match.group(1) for match in (
+                SQLITE_SCAN.match(row[-1]) for row in cursor.fetchall())
+            if match
+        }
+
+
+class Command(BaseCommand):
+    help = 'checking API query plans for sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench_0',
+                            help='username of the requesting user')
+        parser.add_argument('--min-rows', default=1000, type=int,
+                            help='tables with fewer rows may be scanned')
+        parser.add_argument('--allow', action='append', default=[],
+                            metavar='ENDPOINT:TABLE',
+                            help='allowed sequential scan')
+
+    def explain(self, send, method, url, params):
+        recorder = SelectRecorder()
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            with connection.execute_wrapper(recorder):
+                response = send(method, url, params)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{method.upper()} {url}: {response.status_code}')
+            scans = [
+                (table, sql) for sql, params in recorder.queries
+                for table in get_scanned_tables(sql, params)
+            ]
+            transaction.set_rollback(True)
+        return scans
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError('Сначала выполните seed_benchmark_data.')
+        token, _ = Token.objects.get_or_create(user=user)
+        send = ClientSender(token)
+        sizes = get_table_sizes()
+        allowed = EXPECTED_SCANS | set(options['allow'])
+        if connection.vendor != 'postgresql':
+            allowed |= SQLITE_EXPECTED_SCANS
+        failures = []
+        with tempfile.TemporaryDirectory() as media, override_settings(
+                CACHES=PLAN_CACHES, MEDIA_ROOT=media,
+                THROTTLE_STORE=BENCHMARK_THROTTLE_STORE):
+            for name, (method, url, params, *auth) in get_endpoints(
+                    user).items():
+                cache.clear()
+                scans = [
+                    (table, sql) for table, sql in self.explain(
+                        partial(send, auth[0] if auth else True),
+                        method, url, params)
+                    if sizes.get(table, 0) >= options['min_rows']
+                    and f'{name}:{table}' not in allowed
+                ]
+                self.stdout.write(
+                    f'{name:32} последовательных сканирований {len(scans)}')
+                failures.extend(
+                    f'{name}: {table}\n    {sql}' for table, sql in scans)
+        if failures:
+            raise CommandError('\n'.join(failures))
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def get_shape(sql):
+    return IN_LIST.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+
+    def __init__(self):
+        self.shapes = {}
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            stats = self.shapes.setdefault(get_shape(sql), [0, 0.0])
+            stats[0] += 1
+            stats[1] = max(stats[1], duration)
+
+    def slowest(self, limit):
+        return sorted(
+            self.shapes.items(), key=lambda item: item[1][1], reverse=True
+        )[:limit]
+
+    def repeated(self, threshold):
+        return [
+            (shape, count) for shape, (count, _) in self.shapes.items()
+            if count >= threshold
+        ]
+
+
+def install_recorder(stack, recorder):
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(recorder))
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.SQL_INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            install_recorder(stack, recorder)
+            response = self.get_response(request)
+        total = (time.perf_counter() - start) * 1000
+        self.report(request, response, recorder, total)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SQL_INSTRUMENTATION_SAMPLE_RATE:
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(install_recorder)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        total = (time.perf_counter() - start) * 1000
+        self.report(request, response, recorder, total)
+        return response
+
+    def report(self, request, response, recorder, total):
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        db_time = recorder.duration * 1000
+        timing = (
+            f'db;dur={db_time:.2f};desc="{recorder.count} queries", '
+            f'app;dur={total:.2f}'
+        )
+        if response.has_header('Server-Timing'):
+            timing = f'{response["Server-Timing"]}, {timing}'
+        response['Server-Timing'] = timing
+        slowest = recorder.slowest(settings.SQL_INSTRUMENTATION_SLOWEST)
+        logger.info(
+            'view=%s method=%s status=%s queries=%d db_ms=%.2f '
+            'total_ms=%.2f',
+            view, request.method, response.status_code, recorder.count,
+            db_time, total,
+            extra={
+                'view': view,
+                'queries': recorder.count,
+                'db_ms': round(db_time, 2),
+                'total_ms': round(total, 2),
+                'slowest': [
+                    {'sql': shape, 'ms': round(duration * 1000, 2)}
+                    for shape, (_, duration) in slowest
+                ],
+            },
+        )
+        for shape, count in recorder.repeated(
+                settings.SQL_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD):
+            logger.warning(
+                'possible N+1 view=%s repeats=%d sql=%s',
+                view, count, shape,
+                extra={'view': view, 'repeats': count, 'sql': shape},
+            )
@@ -1,4 +1,17 @@
+from functools import update_wrapper
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import Http404
 from rest_framework import mixins, viewsets
+from rest_framework.response import Response
+
+from .snapshots import get_version
+
+CACHE_STATS_KEY = 'response:{}:{}'
 
 
 class ListViewSet(mixins.ListModelMixin,
@@ -10,3 +23,168 @@ class ListRetrieveViewSet(mixins.ListModelMixin,
                           mixins.RetrieveModelMixin,
                           viewsets.GenericViewSet):
     pass
+
+
+class AsyncReadMixin:
+    async_actions = ('list', 'retrieve')
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        sync_view = super().as_view(actions, **initkwargs)
+        async_methods = {
+            method for method, action in actions.items()
+            if action in cls.async_actions
+        }
+        if 'get' in async_methods:
+            async_methods.add('head')
+        if not settings.ASYNC_READ_VIEWS or not async_methods:
+            return sync_view
+
+        async def view(request, *args, **kwargs):
+            if request.method.lower() not in async_methods:
+                return await sync_to_async(sync_view)(
+                    request, *args, **kwargs)
+            self = cls(**initkwargs)
+            actions = dict(sync_view.actions)
+            if 'get' in actions and 'head' not in actions:
+                actions['head'] = actions['get']
+            self.action_map = actions
+            for method, action in actions.items():
+                setattr(self, method, getattr(self, action))
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            return await self.adispatch(request, *args, **kwargs)
+
+        return update_wrapper(view, sync_view)
+
+    async def adispatch(self, request, *args, **kwargs):
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() not in self.http_method_names:
+                self.http_method_not_allowed(request, *args, **kwargs)
+            handler = getattr(self, f'a{self.action}')
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs)
+        return self.response
+
+    async def afilter_queryset(self):
+        return await sync_to_async(self.filter_queryset)(self.get_queryset())
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset, self.request, view=self)
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instance = await queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).afirst()
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        if instance is None:
+            raise Http404
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    async def aserialize(self, instance, many=False):
+        return self.get_serializer(instance, many=many).data
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await self.afilter_queryset()
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                await self.aserialize(page, many=True))
+        objects = [obj async for obj in queryset]
+        return Response(await self.aserialize(objects, many=True))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return Response(await self.aserialize(await self.aget_object()))
+
+
+def count_cache_event(name, event):
+    key = CACHE_STATS_KEY.format(name, event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_cache_stats(name):
+    return {
+        event: cache.get(CACHE_STATS_KEY.format(name, event), 0)
+        for event in ('hits', 'misses')
+    }
+
+
+class AnonymousCacheMixin:
+    cache_name = None
+    cache_timeout = 60 * 5
+
+    def get_cache_key(self, request):
+        query = urlencode(sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        ))
+        version = get_version(self.cache_name)
+        return (f'response:{self.cache_name}:{version}:{request.scheme}://'
+                f'{request.get_host()}{request.path}?{query}')
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            count_cache_event(self.cache_name, 'hits')
+            return Response(data, headers={'X-Cache': 'HIT'})
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+        count_cache_event(self.cache_name, 'misses')
+        response['X-Cache'] = 'MISS'
+        return response
+
+    async def aget_cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return await handler(request, *args, **kwargs)
+        key = await sync_to_async(self.get_cache_key)(request)
+        data = await cache.aget(key)
+        if data is not None:
+            await sync_to_async(count_cache_event)(self.cache_name, 'hits')
+            return Response(data, headers={'X-Cache': 'HIT'})
+        response = await handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, response.data, self.cache_timeout)
+        await sync_to_async(count_cache_event)(self.cache_name, 'misses')
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.aget_cached_response(
+            super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aget_cached_response(
+            super().aretrieve, request, *args, **kwargs)
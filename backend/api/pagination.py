@@ -1,5 +1,208 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class EstimatedCountPaginator(Paginator):
+    estimate_threshold = 10000
+
+    def __init__(self, *args, estimate=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimate = estimate
+        self.is_estimated = False
+
+    def get_estimated_count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if (not self.estimate or connection.vendor != 'postgresql'
+                or queryset.query.where):
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                (queryset.model._meta.db_table,)
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < self.estimate_threshold:
+            return None
+        self.is_estimated = True
+        return row[0]
+
+    @cached_property
+    def count(self):
+        estimated = self.get_estimated_count()
+        if estimated is None:
+            return super().count
+        return estimated
+
+    async def acount(self):
+        if 'count' not in self.__dict__:
+            estimated = await sync_to_async(self.get_estimated_count)()
+            if estimated is None:
+                estimated = await self.object_list.acount()
+            self.count = estimated
+        return self.count
 
 
 class FoodGramPagination(PageNumberPagination):
+    django_paginator_class = EstimatedCountPaginator
     page_size_query_param = 'limit'
+    count_query_param = 'count'
+    estimated_count = 'estimated'
+
+    def set_count_mode(self, request):
+        self.django_paginator_class = partial(
+            EstimatedCountPaginator,
+            estimate=request.query_params.get(
+                self.count_query_param) == self.estimated_count
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.set_count_mode(request)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.set_count_mode(request)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        await paginator.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        self.page.object_list = [
+            obj async for obj in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.page.paginator.is_estimated:
+            response.data['count_estimated'] = True
+        return response
+
+
+class RecipePagination(FoodGramPagination):
+    cursor_query_param = 'cursor'
+    cursor = None
+
+    def encode_position(self, pub_date, recipe_id):
+        position = f'{pub_date.isoformat()}|{recipe_id}'
+        return urlsafe_b64encode(position.encode()).decode()
+
+    def encode_cursor(self, recipe):
+        return self.encode_position(recipe.pub_date, recipe.id)
+
+    def decode_cursor(self, value):
+        try:
+            pub_date, recipe_id = urlsafe_b64decode(
+                value.encode()).decode().split('|')
+            return datetime.fromisoformat(pub_date), int(recipe_id)
+        except (TypeError, ValueError):
+            raise NotFound('Неверный курсор.')
+
+    def get_cursor_queryset(self, queryset, request):
+        self.request = request
+        if any(request.query_params.get(param) for param in (
+                api_settings.ORDERING_PARAM, api_settings.SEARCH_PARAM)):
+            raise ValidationError({
+                self.cursor_query_param: 'Курсор нельзя использовать '
+                                         'вместе с сортировкой или поиском.'
+            })
+        self.cursor = request.query_params[self.cursor_query_param]
+        queryset = queryset.order_by('-pub_date', '-id')
+        if self.cursor:
+            pub_date, recipe_id = self.decode_cursor(self.cursor)
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, id__lt=recipe_id)
+            )
+        return queryset[:self.get_page_size(request) + 1]
+
+    def get_cursor_page(self, recipes):
+        page_size = self.get_page_size(self.request)
+        self.next_cursor = None
+        if len(recipes) > page_size:
+            recipes = recipes[:page_size]
+            self.next_cursor = self.encode_cursor(recipes[-1])
+        return recipes
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.cursor = None
+            return super().paginate_queryset(queryset, request, view)
+        return self.get_cursor_page(
+            list(self.get_cursor_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.cursor = None
+            return await super().apaginate_queryset(queryset, request, view)
+        return self.get_cursor_page([
+            recipe async for recipe
+            in self.get_cursor_queryset(queryset, request)
+        ])
+
+    def get_next_link(self):
+        if self.cursor is None:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class FeedPagination(RecipePagination):
+
+    def paginate_positions(self, sources, request):
+        self.request = request
+        self.cursor = request.query_params.get(self.cursor_query_param, '')
+        page_size = self.get_page_size(request)
+        if self.cursor:
+            pub_date, recipe_id = self.decode_cursor(self.cursor)
+        positions = set()
+        for queryset, key in sources:
+            if self.cursor:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date)
+                    | Q(pub_date=pub_date, **{f'{key}__lt': recipe_id})
+                )
+            positions.update(queryset.order_by(
+                '-pub_date', f'-{key}'
+            ).values_list('pub_date', key)[:page_size + 1])
+        positions = sorted(positions, reverse=True)[:page_size + 1]
+        self.next_cursor = None
+        if len(positions) > page_size:
+            positions = positions[:page_size]
+            pub_date, recipe_id = positions[-1]
+            self.next_cursor = self.encode_position(pub_date, recipe_id)
+        return [recipe_id for _, recipe_id in positions]
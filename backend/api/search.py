@@ -0,0 +1,55 @@
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+from .snapshots import get_version
+
+
+def fold(value):
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._keys = None
+        self._items = None
+
+    def _load(self):
+        version = get_version('ingredients')
+        with self._lock:
+            if self._keys is None or self._version != version:
+                rows = sorted(
+                    (fold(item['name']), item['name'], item['id'], item)
+                    for item in Ingredient.objects.values(
+                        'id', 'name', 'measurement_unit')
+                )
+                self._items = [row[3] for row in rows]
+                self._keys = [row[0] for row in rows]
+                self._version = version
+            return self._keys, self._items
+
+    def search(self, prefix, limit=None):
+        if limit is None:
+            limit = settings.INGREDIENTS_SEARCH_LIMIT
+        keys, items = self._load()
+        key = fold(prefix)
+        start = bisect_left(keys, key)
+        end = bisect_left(keys, key + '\U0010ffff', start)
+        literal = prefix.casefold()
+        ranked = sorted(
+            range(start, end),
+            key=lambda i: (
+                keys[i] != key,
+                not items[i]['name'].casefold().startswith(literal),
+                i,
+            )
+        )
+        return [items[i] for i in ranked[:limit]]
+
+
+ingredient_index = IngredientIndex()
@@ -1,15 +1,84 @@
-from django.shortcuts import get_object_or_404
+from collections import defaultdict
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import (F, Manager, Prefetch,
+                              prefetch_related_objects)
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import exceptions, serializers, status, validators
 
+from recipes.images import process_recipe_image
 from recipes.models import (AddAmount, Favorite, Ingredient, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingCartTotal, Tag, lock_users,
+                            schedule_search_vector_update)
 from users.models import Subscription, User
 
+from .fields import Base64ImageUploadField
+from .fragments import FRAGMENT_TIMEOUT, get_fragment_keys
+from .utils import get_recipes_limit
 from .validators import password_verification
 
 
+def get_followed_ids(request):
+    if not hasattr(request, '_followed_ids'):
+        request._followed_ids = frozenset(
+            Subscription.objects.filter(user=request.user).values_list(
+                'author_id', flat=True)
+        )
+    return request._followed_ids
+
+
+async def aget_followed_ids(request):
+    if not hasattr(request, '_followed_ids'):
+        request._followed_ids = frozenset([
+            author_id async for author_id in Subscription.objects.filter(
+                user=request.user).values_list('author_id', flat=True)
+        ])
+    return request._followed_ids
+
+
+def is_subscribed(request, author_id):
+    return (request.user.is_authenticated
+            and author_id in get_followed_ids(request))
+
+
+def prefetch_recipe_details(recipes):
+    prefetch_related_objects(
+        recipes,
+        'tags',
+        Prefetch(
+            'ingredients_recipes',
+            queryset=AddAmount.objects.select_related('ingredients')
+        ),
+    )
+
+
+def set_prefetched(instance, name, objects):
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = objects
+    queryset._prefetch_done = True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = queryset
+
+
+async def aprefetch_recipe_details(recipes):
+    tags = defaultdict(list)
+    async for tag in Tag.objects.filter(recipes__in=recipes).annotate(
+            recipe_id=F('recipes__id')):
+        tags[tag.recipe_id].append(tag)
+    amounts = defaultdict(list)
+    async for amount in AddAmount.objects.filter(
+            recipe__in=recipes).select_related('ingredients'):
+        amounts[amount.recipe_id].append(amount)
+    for recipe in recipes:
+        set_prefetched(recipe, 'tags', tags[recipe.pk])
+        set_prefetched(recipe, 'ingredients_recipes', amounts[recipe.pk])
+
+
 class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed')
@@ -39,9 +108,7 @@ class CustomUserSerializer(UserSerializer):
         ]
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return (user.is_authenticated
-                and obj.following.filter(user=user).exists())
+        return is_subscribed(self.context.get('request'), obj.id)
 
     def validate_user(self, value):
         user = self.context.get('request').user
@@ -140,17 +207,18 @@ class SubscriptionListSerializer(CustomUserSerializer):
         if not request or request.user.is_anonymous:
             return False
         context = {'request': request}
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit is not None:
-            recipes = obj.recipes.all()[:int(recipes_limit)]
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
         else:
-            recipes = obj.recipes.all()
+            recipes = obj.recipes.all()[:get_recipes_limit(request)]
         return PartialRecipeSerializer(
             recipes, many=True, context=context).data
 
     def get_recipes_count(self, obj):
         user = self.context.get('request').user
         if user.is_authenticated:
+            if hasattr(obj, 'recipes_count'):
+                return obj.recipes_count
             return Recipe.objects.filter(author=obj).count()
         raise exceptions.NotAuthenticated(
             detail='Учетные данные не были предоставлены.',
@@ -173,24 +241,17 @@ class SubscriptionSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         user = self.context.get('request').user
-        subscription_id = data.get('id')
-        user_id = data.get('user_id')
-        author_id = data.get('author_id')
-        subscription = Subscription.objects.filter(id=subscription_id,
-                                                   user=user_id,
-                                                   author=author_id).exists()
-        if subscription:
-            raise serializers.ValidationError(
-                detail=f'Вы уже подписаны на {author_id}.',
-                code=status.HTTP_400_BAD_REQUEST
-            )
-        if author_id == user.id:
+        if data['author'] == user:
             raise serializers.ValidationError(
                 detail='Вы не можете подписаться на самого себя.',
                 code=status.HTTP_400_BAD_REQUEST
             )
         return data
 
+    @transaction.atomic
+    def create(self, validated_data):
+        return super().create(validated_data)
+
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
@@ -219,7 +280,7 @@ class AddAmountSerializer(serializers.ModelSerializer):
 
 
 class AddAmountCUDSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -234,6 +295,13 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug',)
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        return self.child.to_representation_many(list(recipes))
+
+
 class RecipeListRetrieveSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = CustomUserSerializer(read_only=True)
@@ -248,6 +316,7 @@ class RecipeListRetrieveSerializer(serializers.ModelSerializer):
         method_name='get_is_in_shopping_cart',
         read_only=True
     )
+    image = serializers.ImageField(use_url=False, read_only=True)
 
     class Meta:
         model = Recipe
@@ -259,35 +328,125 @@ class RecipeListRetrieveSerializer(serializers.ModelSerializer):
                   'is_in_shopping_cart',
                   'name',
                   'image',
+                  'image_variants',
                   'text',
-                  'cooking_time',)
+                  'cooking_time',
+                  'favorites_count',)
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, recipes):
+        keys = get_fragment_keys(recipe.pk for recipe in recipes)
+        fragments = cache.get_many(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in fragments
+        ]
+        if missing:
+            fresh = Recipe.objects.with_related().in_bulk(
+                [recipe.pk for recipe in missing])
+            missing = self.refresh_missing(missing, fresh)
+            prefetch_recipe_details(missing)
+            created = self.build_fragments(missing, keys)
+            cache.set_many(created, FRAGMENT_TIMEOUT)
+            fragments.update(created)
+        return self.apply_fragments(recipes, keys, fragments)
+
+    async def ato_representation_many(self, recipes):
+        request = self.context.get('request')
+        if request.user.is_authenticated:
+            await aget_followed_ids(request)
+        keys = await sync_to_async(get_fragment_keys)(
+            [recipe.pk for recipe in recipes])
+        fragments = await sync_to_async(cache.get_many)(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in fragments
+        ]
+        if missing:
+            fresh = {
+                recipe.pk: recipe
+                async for recipe in Recipe.objects.with_related().filter(
+                    pk__in=[recipe.pk for recipe in missing])
+            }
+            missing = self.refresh_missing(missing, fresh)
+            await aprefetch_recipe_details(missing)
+            created = self.build_fragments(missing, keys)
+            await sync_to_async(cache.set_many)(created, FRAGMENT_TIMEOUT)
+            fragments.update(created)
+        return self.apply_fragments(recipes, keys, fragments)
+
+    def refresh_missing(self, recipes, fresh):
+        for recipe in fresh.values():
+            recipe.is_favorited = recipe.is_in_shopping_cart = False
+        return [fresh.get(recipe.pk, recipe) for recipe in recipes]
+
+    def build_fragments(self, recipes, keys):
+        return {
+            keys[recipe.pk]: super(
+                RecipeListRetrieveSerializer, self
+            ).to_representation(recipe)
+            for recipe in recipes
+        }
+
+    def apply_fragments(self, recipes, keys, fragments):
+        return [
+            self.apply_user_fields(recipe, fragments[keys[recipe.pk]])
+            for recipe in recipes
+        ]
+
+    def apply_user_fields(self, recipe, fragment):
+        data = dict(fragment)
+        data['is_favorited'] = self.get_is_favorited(recipe)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(recipe)
+        data['favorites_count'] = recipe.favorites_count
+        data['image'] = data['image'] and self.get_media_url(data['image'])
+        data['image_variants'] = {
+            variant: self.get_media_url(name)
+            for variant, name in data['image_variants'].items()
+        }
+        if data['author'] is not None:
+            data['author'] = dict(
+                data['author'],
+                is_subscribed=is_subscribed(
+                    self.context.get('request'), recipe.author_id)
+            )
+        return data
 
     def get_ingredients(self, obj):
-        ingredients = AddAmount.objects.filter(recipe=obj)
-        return AddAmountSerializer(ingredients, many=True).data
+        return AddAmountSerializer(
+            obj.ingredients_recipes.all(), many=True).data
+
+    def get_media_url(self, name):
+        return self.context.get('request').build_absolute_uri(
+            default_storage.url(name))
 
     def get_is_favorited(self, obj):
         if self.context.get('request').method == 'POST':
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
-        if user.is_authenticated:
-            return user.user_favorite.filter(recipe=obj).exists()
-        return False
+        obj.is_favorited = (user.is_authenticated
+                            and user.user_favorite.filter(recipe=obj).exists())
+        return obj.is_favorited
 
     def get_is_in_shopping_cart(self, obj):
         if self.context.get('request').method == 'POST':
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
-        if user.is_authenticated:
-            return user.user_cart.filter(recipe=obj).exists()
-        return False
+        obj.is_in_shopping_cart = (
+            user.is_authenticated
+            and user.user_cart.filter(recipe=obj).exists())
+        return obj.is_in_shopping_cart
 
 
 class RecipeManipulationSerializer(serializers.ModelSerializer):
     ingredients = AddAmountCUDSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True)
-    image = Base64ImageField()
+    tags = serializers.ListField(child=serializers.IntegerField())
+    image = Base64ImageUploadField()
 
     class Meta:
         model = Recipe
@@ -300,26 +459,36 @@ class RecipeManipulationSerializer(serializers.ModelSerializer):
                   'cooking_time',)
 
     def validate(self, data):
-        ingredients = self.initial_data['ingredients']
-        if not ingredients or len(ingredients) == 0:
+        ingredients = data.get('ingredients')
+        if not ingredients:
             raise serializers.ValidationError(
                 'Укажите название и количество ингредиентов'
             )
-        ingredients_id = []
-        for item in ingredients:
-            ingredient = get_object_or_404(
-                Ingredient,
-                id=item['id']
+        ingredients_id = [item['id'] for item in ingredients]
+        if len(set(ingredients_id)) != len(ingredients_id):
+            raise serializers.ValidationError(
+                'Ингредиент уже использован.'
             )
-            if int(item.get('amount')) < 1:
-                raise serializers.ValidationError(
-                    'Укажите необходимое количество ингредиента'
-                )
-            if ingredient in ingredients_id:
-                raise serializers.ValidationError(
-                    'Ингредиент уже использован.'
-                )
-            ingredients_id.append(ingredient)
+        if any(item['amount'] < 1 for item in ingredients):
+            raise serializers.ValidationError(
+                'Укажите необходимое количество ингредиента'
+            )
+        tags_id = list(dict.fromkeys(data.get('tags', ())))
+        found_ingredients = Ingredient.objects.in_bulk(ingredients_id)
+        found_tags = Tag.objects.in_bulk(tags_id) if tags_id else {}
+        errors = {}
+        for field, ids, found in (
+                ('ingredients', ingredients_id, found_ingredients),
+                ('tags', tags_id, found_tags)):
+            missing = sorted(set(ids) - found.keys())
+            if missing:
+                errors[field] = f'Объекты не найдены: {missing}'
+        if errors:
+            raise serializers.ValidationError(errors)
+        for item in ingredients:
+            item['id'] = found_ingredients[item['id']]
+        if 'tags' in data:
+            data['tags'] = [found_tags[pk] for pk in tags_id]
 
         cooking_time = data['cooking_time']
         if int(cooking_time) <= 0:
@@ -338,30 +507,71 @@ class RecipeManipulationSerializer(serializers.ModelSerializer):
             ))
         return AddAmount.objects.bulk_create(bulk_list)
 
+    def update_ingredients(self, recipe, ingredients):
+        new_amounts = {
+            item['id'].id: (item['id'], item['amount'])
+            for item in ingredients
+        }
+        changes = {}
+        changed, removed = [], []
+        for row in AddAmount.objects.filter(recipe=recipe):
+            ingredient, amount = new_amounts.pop(
+                row.ingredients_id, (None, 0))
+            if ingredient is None:
+                removed.append(row.id)
+            elif row.amount != amount:
+                changed.append(row)
+            else:
+                continue
+            changes[row.ingredients_id] = (
+                changes.get(row.ingredients_id, 0) + amount - row.amount)
+            row.amount = amount
+        AddAmount.objects.filter(id__in=removed).delete()
+        AddAmount.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients(recipe, (
+            {'id': ingredient, 'amount': amount}
+            for ingredient, amount in new_amounts.values()
+        ))
+        for ingredient, amount in new_amounts.values():
+            changes[ingredient.id] = changes.get(ingredient.id, 0) + amount
+        if new_amounts:
+            schedule_search_vector_update([recipe.pk])
+        return changes
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        transaction.on_commit(
+            partial(process_recipe_image, recipe.pk, recipe.image.name))
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        recipe = instance
-        instance.name = validated_data.get('name', instance.name)
-        instance.image = validated_data.get('image', instance.image)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time',
-            instance.cooking_time
-        )
-        instance.tags.clear()
-        tags = validated_data.get('tags')
-        instance.tags.set(tags)
-        AddAmount.objects.filter(recipe=recipe).all().delete()
-        ingredients = validated_data.get('ingredients')
-        self.create_ingredients(recipe, ingredients)
-        instance.save()
+        ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags', None)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        if 'image' in validated_data:
+            instance.image_variants = {}
+            transaction.on_commit(partial(
+                process_recipe_image, instance.pk, instance.image.name))
+        if tags is not None:
+            instance.tags.set(tags)
+        user_ids = lock_users(instance.cart.values('user_id'))
+        changes = self.update_ingredients(instance, ingredients)
+        skipped = {'favorites_count', 'search_vector'}
+        if 'image' not in validated_data:
+            skipped.add('image_variants')
+        instance.save(update_fields=[
+            field.name for field in Recipe._meta.concrete_fields
+            if not field.primary_key and field.name not in skipped
+        ])
+        if changes:
+            ShoppingCartTotal.objects.apply(user_ids, changes)
         return instance
 
     def to_representation(self, instance):
@@ -383,6 +593,13 @@ class FavoriteSerializer(serializers.ModelSerializer):
             )
         ]
 
+    @transaction.atomic
+    def create(self, validated_data):
+        favorite = super().create(validated_data)
+        Recipe.objects.filter(pk=favorite.recipe_id).update(
+            favorites_count=F('favorites_count') + 1)
+        return favorite
+
     def validate(self, data):
         user = data.get('user_id')
         recipe_req = data['recipe']
@@ -401,6 +618,14 @@ class FavoriteSerializer(serializers.ModelSerializer):
             instance.recipe, context=context).data
 
 
+class RecipeBatchSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+
 class ShoppingCartSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -414,6 +639,10 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             )
         ]
 
+    @transaction.atomic
+    def create(self, validated_data):
+        return super().create(validated_data)
+
     def validate(self, data):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
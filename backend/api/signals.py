@@ -0,0 +1,191 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (AddAmount, FeedEntry, Ingredient, Recipe,
+                            ShoppingCart, ShoppingCartTotal, Tag, lock_users,
+                            schedule_search_vector_update)
+from users.models import Subscription, User
+from .authentication import invalidate_tokens
+from .fragments import invalidate_recipe_fragments
+from .snapshots import bump_version
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    transaction.on_commit(lambda: bump_version('ingredients'))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(**kwargs):
+    transaction.on_commit(lambda: bump_version('tags'))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(instance, **kwargs):
+    if instance.tracked_fields_changed():
+        schedule_search_vector_update([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=AddAmount)
+def update_ingredients_search_vector(instance, **kwargs):
+    schedule_search_vector_update([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search_vector(instance, created, **kwargs):
+    if instance.tracked_fields_changed() and not created:
+        schedule_search_vector_update(
+            instance.ingredient_for_recipe.values_list(
+                'recipe_id', flat=True))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=AddAmount)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipes_version(**kwargs):
+    transaction.on_commit(lambda: bump_version('recipes'))
+
+
+@receiver(post_save, sender=User)
+def bump_authors_version(instance, created, **kwargs):
+    if not created and instance.tracked_fields_changed():
+        transaction.on_commit(lambda: bump_version('recipes'))
+
+
+def invalidate_on_commit(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: invalidate_recipe_fragments(recipe_ids))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_fragment(instance, **kwargs):
+    invalidate_on_commit([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=AddAmount)
+def invalidate_amount_fragment(instance, **kwargs):
+    invalidate_on_commit([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags_fragments(instance, action, reverse, pk_set,
+                                     **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_on_commit([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_on_commit(instance.recipes.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_on_commit(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def invalidate_tag_fragments(instance, **kwargs):
+    invalidate_on_commit(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_fragments(instance, created, **kwargs):
+    if not created:
+        invalidate_on_commit(instance.ingredient_for_recipe.values_list(
+            'recipe_id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_fragments(instance, created, **kwargs):
+    if not created and instance.tracked_fields_changed():
+        invalidate_on_commit(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_tokens([key]))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        keys = list(Token.objects.filter(
+            user=instance).values_list('key', flat=True))
+        transaction.on_commit(lambda: invalidate_tokens(keys))
+
+
+def add_follower(user_id, author_id):
+    User.objects.filter(pk=author_id).update(
+        followers_count=F('followers_count') + 1)
+    author = User.objects.only('followers_count').get(pk=author_id)
+    FeedEntry.objects.backfill([user_id], author)
+
+
+def remove_follower(user_id, author_id):
+    FeedEntry.objects.filter(user=user_id, author=author_id).delete()
+    User.objects.filter(pk=author_id).update(
+        followers_count=F('followers_count') - 1)
+    author = User.objects.only('followers_count').filter(
+        pk=author_id).first()
+    if author and author.followers_count == settings.FEED_FANOUT_LIMIT:
+        FeedEntry.objects.backfill(
+            Subscription.objects.filter(
+                author=author).values_list('user_id', flat=True),
+            author)
+
+
+@receiver(post_save, sender=Subscription)
+def follow_author(instance, created, **kwargs):
+    if created:
+        add_follower(instance.user_id, instance.author_id)
+    elif instance.tracked_fields_changed():
+        remove_follower(instance.loaded_values['user_id'],
+                        instance.loaded_values['author_id'])
+        add_follower(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def unfollow_author(instance, **kwargs):
+    remove_follower(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_cart_totals(instance, created, **kwargs):
+    if created:
+        ShoppingCartTotal.objects.add_carts(
+            [(instance.user_id, instance.recipe_id)])
+    elif instance.tracked_fields_changed():
+        ShoppingCartTotal.objects.remove_carts([(
+            instance.loaded_values['user_id'],
+            instance.loaded_values['recipe_id'])])
+        ShoppingCartTotal.objects.add_carts(
+            [(instance.user_id, instance.recipe_id)])
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_cart_totals(instance, origin, **kwargs):
+    if isinstance(origin, ShoppingCart):
+        carts = [(instance.user_id, instance.recipe_id)]
+    elif isinstance(origin, QuerySet) and origin.model is ShoppingCart:
+        if getattr(origin, '_cart_totals_removed', False):
+            return
+        origin._cart_totals_removed = True
+        carts = origin.values_list('user_id', 'recipe_id')
+    else:
+        return
+    ShoppingCartTotal.objects.remove_carts(carts)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_cart_totals(instance, **kwargs):
+    user_ids = lock_users(instance.cart.values('user_id'))
+    if user_ids:
+        ShoppingCartTotal.objects.remove_recipe(user_ids, instance)
@@ -0,0 +1,103 @@
+import gzip
+import time
+
+import brotli
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+SNAPSHOT_KEY = 'snapshot:{}'
+VERSION_KEY = 'snapshot:{}:version'
+
+
+def get_version(name):
+    key = VERSION_KEY.format(name)
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+
+def bump_version(name):
+    try:
+        cache.incr(VERSION_KEY.format(name))
+    except ValueError:
+        get_version(name)
+    cache.delete(SNAPSHOT_KEY.format(name))
+
+
+def build_snapshot(name, queryset, serializer_class):
+    version = get_version(name)
+    body = JSONRenderer().render(serializer_class(queryset, many=True).data)
+    snapshot = {
+        'etag': f'"{name}-{version}"',
+        'identity': body,
+        'gzip': gzip.compress(body),
+        'br': brotli.compress(body),
+    }
+    if get_version(name) == version:
+        cache.set(SNAPSHOT_KEY.format(name), snapshot, timeout=None)
+    return snapshot
+
+
+def snapshot_response(request, name, queryset, serializer_class):
+    snapshot = cache.get(SNAPSHOT_KEY.format(name))
+    if snapshot is None:
+        snapshot = build_snapshot(name, queryset, serializer_class)
+    return render_snapshot(request, snapshot)
+
+
+async def asnapshot_response(request, name, queryset, serializer_class):
+    snapshot = await cache.aget(SNAPSHOT_KEY.format(name))
+    if snapshot is None:
+        objects = [obj async for obj in queryset]
+        snapshot = await sync_to_async(build_snapshot)(
+            name, objects, serializer_class)
+    return render_snapshot(request, snapshot)
+
+
+def parse_accept_encoding(header):
+    qualities = {}
+    for item in header.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities
+
+
+def choose_encoding(header, encodings):
+    qualities = parse_accept_encoding(header)
+    default = qualities.get('*', 0.0)
+    encoding = max(
+        encodings, key=lambda coding: qualities.get(coding, default))
+    if qualities.get(encoding, default) > 0:
+        return encoding
+    return None
+
+
+def render_snapshot(request, snapshot):
+    etags = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if snapshot['etag'] in (tag.strip() for tag in etags.split(',')):
+        response = HttpResponseNotModified()
+    else:
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), ('br', 'gzip'))
+        if encoding:
+            response = HttpResponse(
+                snapshot[encoding], content_type='application/json')
+            response['Content-Encoding'] = encoding
+        else:
+            response = HttpResponse(
+                snapshot['identity'], content_type='application/json')
+    response['ETag'] = snapshot['etag']
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import (APIClient, APIRequestFactory,
+                                 force_authenticate)
+
+from api.views import (IngredientViewSet, RecipeViewSet,
+                       SubscriptionViewSet, TagViewSet)
+from recipes.models import (AddAmount, Favorite, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+class AsyncReadViewsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@foodgram.ru')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#000001', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г')
+        for i in range(3):
+            author = User.objects.create(
+                username=f'author{i}', email=f'author{i}@foodgram.ru')
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/test.png', cooking_time=10)
+            recipe.tags.set([cls.tag])
+            AddAmount.objects.create(
+                recipe=recipe, ingredients=cls.ingredient, amount=i + 1)
+            Subscription.objects.create(user=cls.user, author=author)
+        Favorite.objects.create(user=cls.user, recipe=recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        cls.recipe = recipe
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_sync(self, viewset, action, url, **kwargs):
+        with override_settings(ASYNC_READ_VIEWS=False):
+            view = viewset.as_view({'get': action})
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, self.user)
+        response = view(request, **kwargs)
+        response.render()
+        return json.loads(response.content)
+
+    def test_read_views_are_async(self):
+        for viewset in (RecipeViewSet, TagViewSet, IngredientViewSet):
+            self.assertTrue(asyncio.iscoroutinefunction(
+                viewset.as_view({'get': 'list', 'post': 'create'})))
+        self.assertFalse(asyncio.iscoroutinefunction(
+            RecipeViewSet.as_view({'post': 'create'})))
+
+    def test_head_requests(self):
+        cases = (
+            ('/api/tags/', 200),
+            (f'/api/tags/{self.tag.id}/', 200),
+            ('/api/ingredients/', 200),
+            (f'/api/ingredients/{self.ingredient.id}/', 200),
+            ('/api/recipes/', 405),
+            (f'/api/recipes/{self.recipe.id}/', 405),
+            ('/api/users/subscriptions/', 405),
+        )
+        for url, status_code in cases:
+            with self.subTest(url=url):
+                response = self.client.head(url)
+                self.assertEqual(response.status_code, status_code)
+
+    async def test_async_client_head_requests(self):
+        for url in ('/api/tags/', f'/api/ingredients/{self.ingredient.id}/'):
+            with self.subTest(url=url):
+                response = await self.async_client.head(url)
+                self.assertEqual(response.status_code, 200)
+        response = await self.async_client.head('/api/recipes/')
+        self.assertEqual(response.status_code, 405)
+
+    def test_async_responses_match_sync_views(self):
+        cases = (
+            (RecipeViewSet, 'list', '/api/recipes/?limit=2', {}),
+            (RecipeViewSet, 'list', '/api/recipes/?cursor=', {}),
+            (RecipeViewSet, 'retrieve', f'/api/recipes/{self.recipe.id}/',
+             {'pk': self.recipe.id}),
+            (SubscriptionViewSet, 'list',
+             '/api/users/subscriptions/?recipes_limit=1', {}),
+            (TagViewSet, 'retrieve', f'/api/tags/{self.tag.id}/',
+             {'pk': self.tag.id}),
+        )
+        for viewset, action, url, kwargs in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                cache.clear()
+                self.assertEqual(
+                    response.json(),
+                    self.get_sync(viewset, action, url, **kwargs))
+
+    def test_invalid_recipes_limit(self):
+        url = '/api/users/subscriptions/?recipes_limit=abc'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('recipes_limit', response.json())
+        cache.clear()
+        self.assertEqual(
+            self.get_sync(SubscriptionViewSet, 'list', url), response.json())
+        author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        response = self.client.post(
+            f'/api/users/{author.id}/subscribe/?recipes_limit=-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Subscription.objects.filter(
+            user=self.user, author=author).exists())
+
+    @override_settings(SUBSCRIPTION_RECIPES_LIMIT=0)
+    def test_default_recipes_limit(self):
+        url = '/api/users/subscriptions/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [author['recipes'] for author in response.json()['results']],
+            [[], [], []])
+        cache.clear()
+        self.assertEqual(
+            self.get_sync(SubscriptionViewSet, 'list', url), response.json())
+
+    def test_not_found(self):
+        response = self.client.get('/api/recipes/0/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_lookup_not_found(self):
+        for url in ('/api/recipes/abc/', '/api/tags/abc/',
+                    '/api/ingredients/abc/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_snapshots(self):
+        self.assertEqual(
+            self.client.get('/api/tags/').json()[0]['slug'], 'breakfast')
+        self.assertEqual(
+            self.client.get('/api/ingredients/').json()[0]['name'], 'соль')
+
+    async def test_async_client(self):
+        response = await self.async_client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
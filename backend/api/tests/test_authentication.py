@@ -0,0 +1,98 @@
+import subprocess
+import sys
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import get_token_cache_key, local_tokens
+from users.models import User
+
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+READ_SHARED_CACHE = '''
+import sys
+import django
+from django.conf import settings
+settings.configure(CACHES={'default': {
+    'BACKEND': '%s', 'LOCATION': sys.argv[1]}})
+django.setup()
+from django.core.cache import cache
+print(cache.has_key(sys.argv[2]))
+''' % FILE_CACHE
+
+
+class CachingTokenAuthenticationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+        self.user = User.objects.create_user(
+            username='reader', email='reader@foodgram.ru',
+            password='old-Passw0rd')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self):
+        return self.client.get('/api/users/me/')
+
+    def get_tags(self):
+        return self.client.get('/api/tags/')
+
+    def test_warm_path_does_not_query_token(self):
+        self.get_tags()
+        with self.assertNumQueries(0):
+            response = self.get_tags()
+        self.assertEqual(response.status_code, 200)
+
+    def test_process_local_cache_falls_back_to_database(self):
+        self.get_tags()
+        local_tokens.clear()
+        self.assertIsNone(cache.get(get_token_cache_key(self.token.key)))
+        with self.assertNumQueries(1):
+            self.get_tags()
+
+    def is_shared(self, location, key):
+        reader = subprocess.run(
+            (sys.executable, '-c', READ_SHARED_CACHE,
+             location, get_token_cache_key(key)),
+            capture_output=True, text=True, check=True)
+        return reader.stdout.strip() == 'True'
+
+    def test_shared_cache_is_used_by_other_processes(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                    'BACKEND': FILE_CACHE, 'LOCATION': location}}):
+                self.get_tags()
+                local_tokens.clear()
+                key = self.token.key
+                self.assertTrue(self.is_shared(location, key))
+                with self.assertNumQueries(0):
+                    self.get_tags()
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.token.delete()
+                self.assertFalse(self.is_shared(location, key))
+
+    def test_logout_invalidates_token(self):
+        self.get_me()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_password_change_invalidates_token(self):
+        self.get_tags()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('new-Passw0rd')
+            self.user.save()
+        with self.assertNumQueries(1):
+            self.get_tags()
+
+    def test_deactivation_invalidates_token(self):
+        self.get_me()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get_me().status_code, 401)
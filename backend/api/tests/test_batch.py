@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (AddAmount, Favorite, Ingredient, Recipe,
+                            ShoppingCart, ShoppingCartTotal, lock_users)
+from users.models import User
+
+
+class RecipeBatchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@foodgram.ru')
+        author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        cls.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г')
+        cls.recipes = []
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/test.png', cooking_time=10)
+            AddAmount.objects.create(
+                recipe=recipe, ingredients=cls.ingredient, amount=i + 1)
+            cls.recipes.append(recipe)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        cls.recipes[0].favorites_count = 1
+        cls.recipes[0].save(update_fields=('favorites_count',))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.ids = [recipe.id for recipe in self.recipes]
+
+    def statuses(self, response):
+        return [result['status'] for result in response.data['results']]
+
+    def test_add_and_remove_favorites(self):
+        response = self.client.post(
+            '/api/recipes/favorite/',
+            {'recipes': self.ids + [999]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(response),
+                         ['exists', 'added', 'added', 'not_found'])
+        self.assertEqual(
+            list(Recipe.objects.order_by('id').values_list(
+                'favorites_count', flat=True)), [1, 1, 1])
+        response = self.client.delete(
+            '/api/recipes/favorite/',
+            {'recipes': self.ids[:2]}, format='json')
+        self.assertEqual(self.statuses(response), ['removed', 'removed'])
+        self.assertEqual(
+            list(Recipe.objects.order_by('id').values_list(
+                'favorites_count', flat=True)), [0, 0, 1])
+
+    def test_add_and_remove_shopping_cart(self):
+        response = self.client.post(
+            '/api/recipes/shopping_cart/',
+            {'recipes': self.ids}, format='json')
+        self.assertEqual(self.statuses(response), ['added'] * 3)
+        self.assertEqual(ShoppingCart.objects.count(), 3)
+        total = ShoppingCartTotal.objects.get(user=self.user)
+        self.assertEqual(total.total, 6)
+        response = self.client.delete(
+            '/api/recipes/shopping_cart/',
+            {'recipes': [self.ids[2], self.ids[2]]}, format='json')
+        self.assertEqual(self.statuses(response), ['removed'])
+        total.refresh_from_db()
+        self.assertEqual(total.total, 3)
+        response = self.client.delete(
+            '/api/recipes/shopping_cart/',
+            {'recipes': [self.ids[2]]}, format='json')
+        self.assertEqual(self.statuses(response), ['missing'])
+
+    def test_cart_changes_lock_the_user(self):
+        with mock.patch('api.views.lock_users',
+                        side_effect=lock_users) as lock:
+            self.client.post(
+                '/api/recipes/shopping_cart/',
+                {'recipes': self.ids}, format='json')
+            self.client.delete(
+                '/api/recipes/shopping_cart/',
+                {'recipes': self.ids}, format='json')
+        self.assertEqual(lock.call_args_list,
+                         [mock.call([self.user.id])] * 2)
+        self.assertFalse(ShoppingCartTotal.objects.exists())
+
+    def test_batch_query_count_does_not_depend_on_size(self):
+        for ids in (self.ids[:1], self.ids[1:]):
+            with self.assertNumQueries(9):
+                self.client.post(
+                    '/api/recipes/shopping_cart/',
+                    {'recipes': ids}, format='json')
+
+    def test_empty_batch_is_rejected(self):
+        response = self.client.post(
+            '/api/recipes/favorite/', {'recipes': []}, format='json')
+        self.assertEqual(response.status_code, 400)
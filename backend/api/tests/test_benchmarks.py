@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from api.management.commands.benchmark_api import BASELINE_PATH
+from recipes.models import AddAmount, Ingredient, Recipe, Tag
+from users.models import User
+
+
+class BenchmarkCommandsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {i}', color=f'#00000{i}', slug=f'tag-{i}')
+            for i in range(3)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(20)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def seed(self, *args):
+        call_command(
+            'seed_benchmark_data', '--users=5', '--recipes=20',
+            '--ingredients-per-recipe=3', '--favorites=3', '--carts=2',
+            '--subscriptions=2', *args, stdout=StringIO())
+
+    def benchmark(self, *args):
+        call_command('benchmark_api', '--iterations=2', '--warmup=0',
+                     *args, stdout=StringIO())
+
+    def test_seed_is_deterministic(self):
+        self.seed()
+        first = list(AddAmount.objects.order_by('id').values_list(
+            'recipe__name', 'ingredients__name', 'amount'))
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Recipe.objects.count(), 20)
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed('--clear')
+        second = list(AddAmount.objects.order_by('id').values_list(
+            'recipe__name', 'ingredients__name', 'amount'))
+        self.assertEqual(first, second)
+
+    def test_benchmark_saves_and_checks_baseline(self):
+        self.seed()
+        output = os.path.join(self.dir.name, 'results.json')
+        self.benchmark(f'--output={output}')
+        with open(output, encoding='utf-8') as f:
+            results = json.load(f)
+        self.assertLessEqual({
+            'recipes-list', 'recipes-create', 'recipes-update',
+            'recipes-delete', 'recipes-favorite-batch-add',
+            'recipes-shopping-cart-batch-remove', 'users-create',
+            'auth-token-login', 'auth-token-logout',
+        }, set(results))
+        self.assertEqual(
+            set(results['recipes-list']),
+            {'p50_ms', 'p95_ms', 'p99_ms', 'queries'})
+        self.benchmark(f'--baseline={output}', '--tolerance=1000')
+        self.benchmark('--asgi', f'--baseline={output}', '--tolerance=1000')
+        results['recipes-list']['queries'] = 0
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f)
+        with self.assertRaises(CommandError):
+            self.benchmark(f'--baseline={output}', '--tolerance=1000')
+
+    def test_committed_query_budgets(self):
+        self.seed()
+        self.benchmark(f'--baseline={BASELINE_PATH}')
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            budgets = json.load(f)
+        budgets['recipes-update']['queries'] -= 1
+        baseline = os.path.join(self.dir.name, 'baseline.json')
+        with open(baseline, 'w', encoding='utf-8') as f:
+            json.dump(budgets, f)
+        with self.assertRaisesMessage(CommandError, 'recipes-update'):
+            self.benchmark(f'--baseline={baseline}')
@@ -0,0 +1,199 @@
+from datetime import datetime
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.fragments import invalidate_recipe_fragments
+from api.serializers import RecipeListRetrieveSerializer
+from recipes.models import AddAmount, Favorite, Ingredient, Recipe, Tag
+from users.models import User
+
+
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class RecipeCacheTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#000001', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Каша', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        cls.recipe.tags.set([cls.tag])
+        AddAmount.objects.create(
+            recipe=cls.recipe, ingredients=cls.ingredient, amount=5)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RecipeResponseCacheTest(RecipeCacheTestCase):
+
+    def test_anonymous_requests_are_cached(self):
+        response = self.client.get('/api/recipes/', {'limit': 6, 'page': 1})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                '/api/recipes/', {'page': 1, 'limit': 6})
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['results'][0]['name'], 'Каша')
+        response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_writes_invalidate_cache(self):
+        self.client.get('/api/recipes/')
+        with self.captureOnCommitCallbacks(execute=True):
+            AddAmount.objects.filter(recipe=self.recipe).update(amount=7)
+            self.recipe.save()
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(
+            response.data['results'][0]['ingredients'][0]['amount'], 7)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.tags.clear()
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['tags'], [])
+
+    def assert_favorites_count(self, count, cached):
+        response = APIClient().get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'HIT' if cached else 'MISS')
+        self.assertEqual(response.data['results'][0]['favorites_count'], count)
+
+    def test_favorites_keep_cached_pages(self):
+        self.assert_favorites_count(0, cached=False)
+        self.client.force_authenticate(self.author)
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(url).status_code, 201)
+        self.assert_favorites_count(0, cached=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(url).status_code, 204)
+            response = self.client.post(
+                '/api/recipes/favorite/', {'recipes': [self.recipe.id]},
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_favorites_count(0, cached=True)
+        cache.clear()
+        self.assert_favorites_count(1, cached=False)
+
+    def test_cache_is_keyed_by_host(self):
+        self.client.get('/api/recipes/', HTTP_HOST='internal:8000')
+        response = self.client.get(
+            '/api/recipes/', HTTP_HOST='foodgram.example.com')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(
+            response.data['results'][0]['image'],
+            'http://foodgram.example.com/media/recipes/test.png')
+        response = self.client.get(
+            '/api/recipes/', HTTP_HOST='foodgram.example.com')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_only_author_fields_invalidate_cache(self):
+        self.client.get('/api/recipes/')
+        author = User.objects.get(pk=self.author.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create(username='new', email='new@foodgram.ru')
+            author.last_login = datetime(2026, 1, 1)
+            author.save(update_fields=['last_login'])
+            author.set_password('новый-пароль')
+            author.save()
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            author.username = 'renamed'
+            author.save()
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(
+            response.data['results'][0]['author']['username'], 'renamed')
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.get('/api/recipes/')
+        self.client.force_authenticate(self.author)
+        response = self.client.get('/api/recipes/')
+        self.assertFalse(response.has_header('X-Cache'))
+
+    def test_cache_stats(self):
+        self.client.get('/api/recipes/')
+        self.client.get('/api/recipes/')
+        admin = User.objects.create(
+            username='admin', email='admin@foodgram.ru', is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/recipes/cache_stats/')
+        self.assertEqual(response.data, {'hits': 1, 'misses': 1})
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RecipeFragmentCacheTest(RecipeCacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.reader = User.objects.create(
+            username='reader', email='reader@foodgram.ru')
+        self.client.force_authenticate(self.reader)
+
+    def test_fragments_skip_prefetch_queries(self):
+        with self.assertNumQueries(6):
+            self.client.get('/api/recipes/')
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/recipes/')
+        recipe = response.data['results'][0]
+        self.assertTrue(recipe['is_favorited'])
+        self.assertFalse(recipe['author']['is_subscribed'])
+        self.assertEqual(recipe['ingredients'][0]['name'], 'соль')
+
+    def test_fragments_are_invalidated(self):
+        self.client.get('/api/recipes/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.name = 'сахар'
+            self.ingredient.save()
+        response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.data['ingredients'][0]['name'], 'сахар')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Иван'
+            self.author.save()
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(
+            response.data['results'][0]['author']['first_name'], 'Иван')
+
+    def test_fragments_are_built_from_current_rows(self):
+        stale = Recipe.objects.with_related().get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=self.recipe.pk).update(name='Суп')
+        invalidate_recipe_fragments([self.recipe.pk])
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        data = RecipeListRetrieveSerializer(
+            stale, context={'request': request}).data
+        self.assertEqual(data['name'], 'Суп')
+        response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.data['name'], 'Суп')
+
+    def test_fragments_use_request_host(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_variants={'small': 'recipes/test_small.webp'})
+        self.client.get('/api/recipes/', HTTP_HOST='first.example.com')
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f'/api/recipes/{self.recipe.id}/',
+                HTTP_HOST='second.example.com')
+        self.assertEqual(
+            response.data['image'],
+            'http://second.example.com/media/recipes/test.png')
+        self.assertEqual(response.data['image_variants'], {
+            'small': 'http://second.example.com/media/recipes/test_small.webp'
+        })
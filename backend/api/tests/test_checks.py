@@ -0,0 +1,18 @@
+from django.test import SimpleTestCase, override_settings
+
+from api.checks import check_shared_cache
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_warns(self):
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ['api.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/0'}})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
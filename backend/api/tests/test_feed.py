@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+
+class FeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@foodgram.ru')
+        cls.author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        cls.other = User.objects.create(
+            username='other', email='other@foodgram.ru')
+        start = datetime(2022, 1, 1)
+        cls.recipes = []
+        for i in range(4):
+            recipe = Recipe.objects.create(
+                author=cls.author if i % 2 else cls.other,
+                name=f'Рецепт {i}', text='Описание',
+                image='recipes/test.png', cooking_time=10)
+            recipe.pub_date = start + timedelta(minutes=i)
+            recipe.save(update_fields=('pub_date',))
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def subscribe(self, author):
+        response = self.client.post(f'/api/users/{author.id}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+
+    def feed_ids(self, **params):
+        response = self.client.get('/api/recipes/feed/', params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_subscribe_backfills_feed(self):
+        self.subscribe(self.author)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertEqual(
+            self.feed_ids(), [self.recipes[3].id, self.recipes[1].id])
+
+    def test_new_recipe_fans_out(self):
+        self.subscribe(self.author)
+        recipe = Recipe.objects.create(
+            author=self.author, name='Новый', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        FeedEntry.objects.fan_out(recipe)
+        self.assertEqual(self.feed_ids()[0], recipe.id)
+
+    def test_unsubscribe_clears_feed(self):
+        self.subscribe(self.author)
+        self.subscribe(self.other)
+        response = self.client.delete(
+            f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+        self.assertEqual(
+            self.feed_ids(), [self.recipes[2].id, self.recipes[0].id])
+
+    def test_cursor_pagination(self):
+        self.subscribe(self.author)
+        self.subscribe(self.other)
+        response = self.client.get('/api/recipes/feed/', {'limit': 3})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [recipe.id for recipe in self.recipes[:0:-1]])
+        cursor = response.data['next'].split('cursor=')[1].split('&')[0]
+        self.assertEqual(
+            self.feed_ids(limit=3, cursor=cursor), [self.recipes[0].id])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_authors_are_read_on_demand(self):
+        self.subscribe(self.author)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(
+            self.feed_ids(), [self.recipes[3].id, self.recipes[1].id])
+
+    def test_cannot_subscribe_to_self(self):
+        response = self.client.post(f'/api/users/{self.user.id}/subscribe/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_subscriptions_outside_api_keep_counter(self):
+        follower = User.objects.create(
+            username='follower', email='follower@foodgram.ru')
+        Subscription.objects.create(user=follower, author=self.author)
+        Subscription.objects.create(user=self.user, author=self.author)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 2)
+        self.assertEqual(
+            self.feed_ids(), [self.recipes[3].id, self.recipes[1].id])
+        follower.delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+
+    def test_changing_subscription_author_moves_counter(self):
+        self.subscribe(self.author)
+        subscription = Subscription.objects.get(user=self.user)
+        subscription.author = self.other
+        subscription.save()
+        self.author.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+        self.assertEqual(self.other.followers_count, 1)
+        self.assertEqual(
+            self.feed_ids(), [self.recipes[2].id, self.recipes[0].id])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_author_dropping_below_limit_is_backfilled(self):
+        follower = User.objects.create(
+            username='follower', email='follower@foodgram.ru')
+        Subscription.objects.create(user=follower, author=self.author)
+        self.subscribe(self.author)
+        recipe = Recipe.objects.create(
+            author=self.author, name='Новый', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        FeedEntry.objects.fan_out(recipe)
+        self.assertFalse(FeedEntry.objects.filter(recipe=recipe).exists())
+        self.assertEqual(self.feed_ids()[0], recipe.id)
+        follower.delete()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, recipe=recipe).exists())
+        self.assertEqual(
+            self.feed_ids(),
+            [recipe.id, self.recipes[3].id, self.recipes[1].id])
+
+    def test_author_profile_reads_keep_counter(self):
+        self.subscribe(self.author)
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+
+    def test_stale_user_save_keeps_counter(self):
+        stale = User.objects.get(pk=self.author.pk)
+        self.subscribe(self.author)
+        stale.set_password('new-password')
+        stale.save()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertTrue(self.author.check_password('new-password'))
+
+    def test_anonymous_forbidden(self):
+        response = APIClient().get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_rebuild_feeds(self):
+        Subscription.objects.create(user=self.user, author=self.author)
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertEqual(FeedEntry.objects.count(), 2)
@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.filters import RecipeOrderingFilter
+from api.views import RecipeViewSet
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+class RecipeTagFilterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag-{i}')
+            for i in range(3)
+        ]
+        cls.recipes = []
+        for i, tags in enumerate(((0,), (0, 1), (1, 2))):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/test.png', cooking_time=10)
+            recipe.tags.set(cls.tags[tag] for tag in tags)
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_ids(self, **params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(recipe['id'] for recipe in response.data['results'])
+
+    def ids(self, *indexes):
+        return [self.recipes[index].id for index in indexes]
+
+    def test_any_mode_returns_each_recipe_once(self):
+        self.assertEqual(
+            self.get_ids(tags=['tag-0', 'tag-1']), self.ids(0, 1, 2))
+        self.assertEqual(self.get_ids(tags='tag-2'), self.ids(2))
+
+    def test_all_mode(self):
+        self.assertEqual(
+            self.get_ids(tags=['tag-0', 'tag-1'], tags_mode='all'),
+            self.ids(1))
+        self.assertEqual(
+            self.get_ids(tags=['tag-0', 'tag-2'], tags_mode='all'), [])
+
+    def test_unknown_slugs(self):
+        self.assertEqual(
+            self.get_ids(tags=['tag-1', 'missing']), self.ids(1, 2))
+        self.assertEqual(self.get_ids(tags='missing'), [])
+        self.assertEqual(
+            self.get_ids(tags=['tag-1', 'missing'], tags_mode='all'), [])
+
+    def test_invalid_mode(self):
+        response = self.client.get(
+            '/api/recipes/', {'tags': 'tag-0', 'tags_mode': 'some'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_tag_map_is_cached(self):
+        self.client.force_authenticate(
+            User.objects.create(username='reader', email='r@foodgram.ru'))
+        self.client.get('/api/recipes/')
+        with self.assertNumQueries(4):
+            self.client.get('/api/recipes/', {'tags': 'tag-0'})
+        with self.assertNumQueries(3):
+            self.client.get('/api/recipes/', {'tags': 'tag-1'})
+
+    def test_tag_changes_refresh_map(self):
+        self.get_ids(tags='tag-0')
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create(
+                name='Новый', color='#000009', slug='new')
+        self.recipes[0].tags.add(tag)
+        self.assertEqual(self.get_ids(tags='new'), self.ids(0))
+
+    def get_ordered_ids(self, ordering):
+        response = self.client.get('/api/recipes/', {'ordering': ordering})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_ordering_has_tiebreakers(self):
+        self.recipes[0].favorites_count = 2
+        self.recipes[0].save(update_fields=['favorites_count'])
+        self.assertEqual(
+            self.get_ordered_ids('-favorites_count'), self.ids(0, 2, 1))
+        self.assertEqual(
+            self.get_ordered_ids('favorites_count'), self.ids(2, 1, 0))
+        self.assertEqual(self.get_ordered_ids('pub_date'), self.ids(0, 1, 2))
+        request = mock.Mock(query_params={'ordering': '-favorites_count'})
+        self.assertEqual(
+            RecipeOrderingFilter().get_ordering(
+                request, Recipe.objects.all(), RecipeViewSet()),
+            ['-favorites_count', '-pub_date', '-id'])
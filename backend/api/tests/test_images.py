@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_PROCESSING_WORKERS=0)
+class RecipeImageTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        self.name = default_storage.save(
+            'recipes/photo.jpg', ContentFile(self.make_jpeg()))
+        self.stem = os.path.splitext(self.name)[0]
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            image=self.name, cooking_time=10)
+
+    def make_jpeg(self):
+        image = Image.new('RGB', (2000, 1000), 'red')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        content = BytesIO()
+        image.save(content, format='JPEG', exif=exif)
+        return content.getvalue()
+
+    def test_variants_are_rendered(self):
+        process_recipe_image(self.recipe.pk, self.name)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {
+            variant: f'{self.stem}_{variant}.webp'
+            for variant in ('small', 'medium')
+        })
+        for variant, size in (('small', 480), ('medium', 960)):
+            with Image.open(default_storage.path(
+                    self.recipe.image_variants[variant])) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.size, (size // 2, size))
+
+    def test_original_is_rotated_without_exif(self):
+        process_recipe_image(self.recipe.pk, self.name)
+        with Image.open(default_storage.path(self.name)) as image:
+            self.assertEqual(image.size, (1000, 2000))
+            self.assertNotIn('exif', image.info)
+
+    def test_replaced_image_is_not_overwritten(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image='recipes/other.jpg')
+        process_recipe_image(self.recipe.pk, self.name)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_variant_urls_in_response(self):
+        process_recipe_image(self.recipe.pk, self.name)
+        response = APIClient().get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['image_variants'], {
+            variant: f'http://testserver/media/{self.stem}_{variant}.webp'
+            for variant in ('small', 'medium')
+        })
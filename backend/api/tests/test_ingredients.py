@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.search import IngredientIndex
+from recipes.models import Ingredient
+
+DUMMY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class IngredientIndexTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('соль', 'сахар', 'сельдерей', 'Соль морская',
+                         'ёрш', 'Ель', 'соль', 'салат')
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def names(self, results):
+        return [item['name'] for item in results]
+
+    @override_settings(CACHES=DUMMY_CACHES)
+    def test_loads_without_cached_version(self):
+        self.assertEqual(
+            self.names(IngredientIndex().search('сах')), ['сахар'])
+
+    def search(self, name):
+        response = APIClient().get('/api/ingredients/', {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return self.names(response.data)
+
+    def test_prefix_search_ranks_matches(self):
+        self.assertEqual(self.search('сол'), ['соль', 'соль', 'Соль морская'])
+        self.assertEqual(self.search('СОЛЬ'),
+                         ['соль', 'соль', 'Соль морская'])
+        self.assertEqual(self.search('с'), [
+            'салат', 'сахар', 'сельдерей', 'соль', 'соль', 'Соль морская'])
+        self.assertEqual(self.search('ноль'), [])
+
+    def test_yo_is_folded(self):
+        self.assertEqual(self.search('ер'), ['ёрш'])
+        self.assertEqual(self.search('ёл'), ['Ель'])
+        self.assertEqual(self.search('ел'), ['Ель'])
+        self.assertEqual(self.search('ёр'), ['ёрш'])
+
+    @override_settings(INGREDIENTS_SEARCH_LIMIT=2)
+    def test_limit(self):
+        self.assertEqual(len(self.search('с')), 2)
+
+    def test_search_does_not_query_after_load(self):
+        self.search('с')
+        with self.assertNumQueries(0):
+            self.search('са')
+
+    def test_new_ingredient_is_searchable(self):
+        self.search('п')
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='перец', measurement_unit='г')
+        self.assertEqual(self.search('пе'), ['перец'])
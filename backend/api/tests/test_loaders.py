@@ -0,0 +1,70 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.fragments import get_fragment_keys
+from api.snapshots import get_version
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+class LoadTagsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag-{i}')
+            for i in range(2)
+        ]
+        cls.recipes = []
+        for tag in cls.tags:
+            recipe = Recipe.objects.create(
+                author=author, name='Рецепт', text='Описание',
+                image='recipes/test.png', cooking_time=10)
+            recipe.tags.set([tag])
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+        cache.set_many({
+            key: 'fragment'
+            for key in get_fragment_keys(
+                recipe.id for recipe in self.recipes).values()
+        })
+
+    def load(self, rows):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.csv', encoding='utf-8', delete=False) as f:
+            f.write('\n'.join(','.join(row) for row in rows))
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('load_tags', f.name, stdout=out)
+        return out.getvalue().strip()
+
+    def cached_fragments(self):
+        keys = get_fragment_keys(recipe.id for recipe in self.recipes)
+        cached = cache.get_many(keys.values())
+        return [pk for pk, key in keys.items() if key in cached]
+
+    def test_recolour_invalidates_recipes(self):
+        version = get_version('recipes')
+        self.assertEqual(self.load([
+            ('Тег 0', '#ffffff', 'tag-0'),
+            ('Тег 1', '#000001', 'tag-1'),
+        ]), 'Добавлено: 0, обновлено: 1, без изменений: 1')
+        self.assertNotEqual(get_version('recipes'), version)
+        self.assertEqual(self.cached_fragments(), [self.recipes[1].id])
+
+    def test_unchanged_load_keeps_cache(self):
+        version = get_version('recipes')
+        self.load([('Тег 2', '#000002', 'tag-2')])
+        self.assertEqual(get_version('recipes'), version)
+        self.assertEqual(self.cached_fragments(),
+                         [recipe.id for recipe in self.recipes])
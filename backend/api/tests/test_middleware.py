@@ -0,0 +1,45 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from api.middleware import QueryInstrumentationMiddleware, get_shape
+from users.models import User
+
+
+@override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1)
+class QueryInstrumentationMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.request = RequestFactory().get('/api/recipes/')
+        self.request.resolver_match = None
+
+    def test_server_timing_header(self):
+        def view(request):
+            list(User.objects.all())
+            return HttpResponse()
+
+        with self.assertLogs('api.middleware', 'INFO') as logs:
+            response = QueryInstrumentationMiddleware(view)(self.request)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('"1 queries"', response['Server-Timing'])
+        self.assertEqual(logs.records[0].queries, 1)
+        self.assertEqual(len(logs.records), 1)
+
+    def test_repeated_queries_are_reported(self):
+        def view(request):
+            for pk in range(6):
+                User.objects.filter(pk__in=range(pk + 1)).first()
+            return HttpResponse()
+
+        with self.assertLogs('api.middleware', 'WARNING') as logs:
+            QueryInstrumentationMiddleware(view)(self.request)
+        self.assertEqual(logs.records[0].repeats, 6)
+
+    @override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_disabled(self):
+        response = QueryInstrumentationMiddleware(
+            lambda request: HttpResponse())(self.request)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_shape_collapses_in_lists(self):
+        self.assertEqual(
+            get_shape('WHERE id IN (%s, %s, %s)'), 'WHERE id IN (...)')
@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class EstimatedCountTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        for i in range(3):
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/test.png', cooking_time=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        connection = mock.MagicMock(vendor='postgresql')
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (50000,)
+        patcher = mock.patch(
+            'api.pagination.connections', {'default': connection})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_exact_count_by_default(self):
+        data = self.get()
+        self.assertEqual(data['count'], 3)
+        self.assertNotIn('count_estimated', data)
+
+    def test_estimated_count_is_opt_in(self):
+        data = self.get(count='estimated')
+        self.assertEqual(data['count'], 50000)
+        self.assertTrue(data['count_estimated'])
+
+    def test_filtered_list_is_counted(self):
+        data = self.get(count='estimated', author=self.author.id)
+        self.assertEqual(data['count'], 3)
+        self.assertNotIn('count_estimated', data)
+
+
+class CursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/test.png', cooking_time=10)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_cursor_pages(self):
+        response = self.client.get('/api/recipes/', {'cursor': '', 'limit': 2})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipes[2].id, self.recipes[1].id])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipes[0].id])
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_rejects_ordering_and_search(self):
+        for params in ({'ordering': 'favorites_count'}, {'search': 'Рецепт'}):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': '', **params})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json())
@@ -0,0 +1,113 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (AddAmount, Favorite, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+class RecipeQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@foodgram.ru')
+        tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag-{i}')
+            for i in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(3)
+        ]
+        for i in range(12):
+            author = User.objects.create(
+                username=f'author{i}', email=f'author{i}@foodgram.ru')
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/test.png', cooking_time=10)
+            recipe.tags.set(tags)
+            AddAmount.objects.bulk_create(
+                AddAmount(recipe=recipe, ingredients=ingredient, amount=i + 1)
+                for ingredient in ingredients
+            )
+            if i % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if i % 3 == 0:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def count_list_queries(self, limit):
+        with self.assertNumQueries(5) as context:
+            response = self.client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(len(response.data['results']), limit)
+        return len(context.captured_queries)
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        self.assertEqual(
+            self.count_list_queries(2), self.count_list_queries(12))
+
+    def test_retrieve_query_count(self):
+        recipe = Recipe.objects.first()
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(len(response.data['ingredients']), 3)
+
+    def test_user_flags_are_annotated(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/recipes/', {'limit': 12})
+        for item in response.data['results']:
+            recipe = Recipe.objects.get(id=item['id'])
+            self.assertEqual(
+                item['is_favorited'],
+                recipe.favorites.filter(user=self.user).exists())
+            self.assertEqual(
+                item['is_in_shopping_cart'],
+                recipe.cart.filter(user=self.user).exists())
+
+    def test_authenticated_list_queries_do_not_depend_on_page_size(self):
+        self.client.force_authenticate(self.user)
+        Subscription.objects.create(
+            user=self.user, author=User.objects.get(username='author3'))
+        with self.assertNumQueries(6):
+            self.client.get('/api/recipes/', {'limit': 2})
+        with self.assertNumQueries(6):
+            response = self.client.get('/api/recipes/', {'limit': 12})
+        subscribed = {
+            item['author']['username']
+            for item in response.data['results']
+            if item['author']['is_subscribed']
+        }
+        self.assertEqual(subscribed, {'author3'})
+
+    def test_users_list_query_count(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/users/', {'limit': 10})
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_subscriptions_query_count(self):
+        for author in User.objects.filter(username__startswith='author'):
+            Subscription.objects.create(user=self.user, author=author)
+            Recipe.objects.create(
+                author=author, name='Ещё рецепт', text='Описание',
+                image='recipes/test.png', cooking_time=5)
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                '/api/users/subscriptions/',
+                {'limit': 10, 'recipes_limit': 1})
+        self.assertEqual(len(response.data['results']), 10)
+        for author in response.data['results']:
+            self.assertEqual(author['recipes_count'], 2)
+            self.assertEqual(len(author['recipes']), 1)
+            self.assertEqual(author['recipes'][0]['name'], 'Ещё рецепт')
+            self.assertTrue(author['is_subscribed'])
+        response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(len(response.data['results'][0]['recipes']), 2)
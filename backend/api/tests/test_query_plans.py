@@ -0,0 +1,55 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.test import TestCase
+
+from recipes.models import AddAmount, Ingredient, Recipe, Tag
+
+
+class QueryPlansTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {i}', color=f'#00000{i}', slug=f'tag-{i}')
+            for i in range(3)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(20)
+        )
+        call_command(
+            'seed_benchmark_data', '--users=5', '--recipes=20',
+            '--ingredients-per-recipe=3', '--favorites=3', '--carts=2',
+            '--subscriptions=2', stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+
+    def check_plans(self):
+        call_command('check_query_plans', '--min-rows=10', stdout=StringIO())
+
+    def test_endpoints_use_indexes(self):
+        self.check_plans()
+
+    def test_missing_index_is_reported(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Recipe._meta.db_table)
+            for name, constraint in constraints.items():
+                if constraint['index'] and constraint['columns'][:1] == [
+                        'author_id']:
+                    cursor.execute(f'DROP INDEX "{name}"')
+        with self.assertRaisesMessage(
+                CommandError, 'recipes-list-author: recipes_recipe'):
+            self.check_plans()
+
+    def test_recipe_ingredients_are_unique(self):
+        amount = AddAmount.objects.first()
+        with self.assertRaises(IntegrityError):
+            AddAmount.objects.create(
+                recipe=amount.recipe, ingredients=amount.ingredients,
+                amount=1)
@@ -0,0 +1,365 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import RequestFactory, TestCase
+from rest_framework.test import APIClient
+
+from api.serializers import RecipeManipulationSerializer
+from recipes.models import (AddAmount, Ingredient, Recipe, RecipeQuerySet,
+                            ShoppingCart, ShoppingCartTotal, Tag)
+from users.models import User
+
+
+class RecipeTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#000001', slug='breakfast')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(4)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        cls.recipe.tags.set([cls.tag])
+        AddAmount.objects.bulk_create(
+            AddAmount(recipe=cls.recipe, ingredients=ingredient,
+                      amount=(i + 1) * 10)
+            for i, ingredient in enumerate(cls.ingredients[:3])
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def edit(self, amounts, **fields):
+        data = {
+            'ingredients': [
+                {'id': self.ingredients[index].id, 'amount': amount}
+                for index, amount in amounts.items()
+            ],
+            'tags': [self.tag.id],
+            'cooking_time': 10,
+            **fields,
+        }
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def amounts(self):
+        return dict(AddAmount.objects.filter(
+            recipe=self.recipe).values_list('ingredients_id', 'amount'))
+
+
+class RecipeEditTest(RecipeTestCase):
+
+    def test_edit_keeps_concurrent_image_variants(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        variants = {'small': 'recipes/test_small.webp'}
+        Recipe.objects.filter(pk=recipe.pk).update(image_variants=variants)
+        serializer = RecipeManipulationSerializer(
+            recipe, partial=True, data={
+                'ingredients': [{'id': self.ingredients[0].id,
+                                 'amount': 5}],
+                'cooking_time': 15,
+            })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, variants)
+
+    def test_edit_keeps_concurrent_favorites_count(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            favorites_count=F('favorites_count') + 1)
+        serializer = RecipeManipulationSerializer(
+            recipe, partial=True, data={
+                'ingredients': [{'id': self.ingredients[0].id,
+                                 'amount': 5}],
+                'cooking_time': 15,
+            })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.cooking_time, 15)
+
+    def test_admin_edit_keeps_concurrent_favorites_count(self):
+        admin = site._registry[Recipe]
+        request = RequestFactory().get('/admin/')
+        request.user = User.objects.create(
+            username='admin', email='admin@foodgram.ru', is_superuser=True)
+        self.assertNotIn('favorites_count',
+                         admin.get_form(request, self.recipe).base_fields)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            favorites_count=F('favorites_count') + 1)
+        recipe.cooking_time = 15
+        admin.save_model(request, recipe, None, change=True)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.cooking_time, 15)
+
+    def test_edit_applies_ingredient_diff(self):
+        unchanged = AddAmount.objects.get(
+            recipe=self.recipe, ingredients=self.ingredients[0])
+        self.edit({0: 10, 1: 25, 3: 40})
+        self.assertEqual(self.amounts(), {
+            self.ingredients[0].id: 10,
+            self.ingredients[1].id: 25,
+            self.ingredients[3].id: 40,
+        })
+        self.assertTrue(AddAmount.objects.filter(
+            pk=unchanged.pk, amount=10).exists())
+
+    def test_unchanged_edit_query_count(self):
+        self.edit({0: 10, 1: 20, 2: 30})
+        with self.assertNumQueries(12):
+            self.edit({0: 10, 1: 20, 2: 30})
+        self.assertEqual(self.amounts(), {
+            self.ingredients[0].id: 10,
+            self.ingredients[1].id: 20,
+            self.ingredients[2].id: 30,
+        })
+
+
+class RecipeValidationTest(RecipeTestCase):
+
+    def validate(self, ingredients, tags):
+        serializer = RecipeManipulationSerializer(partial=True, data={
+            'ingredients': [
+                {'id': pk, 'amount': 10} for pk in ingredients],
+            'tags': tags,
+            'cooking_time': 10,
+        })
+        return serializer.is_valid(), serializer
+
+    def test_one_query_per_relation(self):
+        ids = [ingredient.id for ingredient in self.ingredients]
+        with self.assertNumQueries(2):
+            valid, serializer = self.validate(ids, [self.tag.id])
+        self.assertTrue(valid, serializer.errors)
+        self.assertEqual(
+            [item['id'] for item in serializer.validated_data['ingredients']],
+            self.ingredients)
+        self.assertEqual(serializer.validated_data['tags'], [self.tag])
+
+    def test_missing_ids_reported_together(self):
+        ids = [self.ingredients[0].id, 9998, 9999]
+        valid, serializer = self.validate(ids, [self.tag.id, 9999])
+        self.assertFalse(valid)
+        self.assertEqual(serializer.errors, {
+            'ingredients': ['Объекты не найдены: [9998, 9999]'],
+            'tags': ['Объекты не найдены: [9999]'],
+        })
+
+    def test_duplicate_ingredients(self):
+        ids = [self.ingredients[0].id] * 2
+        with self.assertNumQueries(0):
+            valid, serializer = self.validate(ids, [self.tag.id])
+        self.assertFalse(valid)
+        self.assertEqual(serializer.errors['non_field_errors'],
+                         ['Ингредиент уже использован.'])
+
+
+class SearchVectorUpdateTest(RecipeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.updated = []
+        connection.pending_search_vectors = None
+        patcher = mock.patch.object(
+            RecipeQuerySet, 'update_search_vector', autospec=True,
+            side_effect=lambda queryset: self.updated.append(
+                set(queryset.values_list('pk', flat=True))))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_create_updates_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.author, name='Новый', text='Описание',
+                image='recipes/test.png', cooking_time=5)
+            for ingredient in self.ingredients:
+                AddAmount.objects.create(
+                    recipe=recipe, ingredients=ingredient, amount=1)
+        self.assertEqual(self.updated, [{recipe.pk}])
+
+    def test_amount_edit_skips_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.edit({0: 15, 1: 20, 2: 30}, cooking_time=20)
+        self.assertEqual(self.updated, [])
+
+    def test_text_and_ingredients_edit_updates_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.edit({0: 10, 3: 40}, name='Другой рецепт')
+        self.assertEqual(self.updated, [{self.recipe.pk}])
+
+    def test_ingredient_rename_updates_recipes(self):
+        ingredient = Ingredient.objects.get(pk=self.ingredients[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.measurement_unit = 'кг'
+            ingredient.save()
+        self.assertEqual(self.updated, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.name = 'новое имя'
+            ingredient.save()
+        self.assertEqual(self.updated, [{self.recipe.pk}])
+
+
+class ShoppingCartTotalsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        cls.readers = [
+            User.objects.create(username=f'reader{i}',
+                                email=f'reader{i}@foodgram.ru')
+            for i in range(2)
+        ]
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#000001', slug='breakfast')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(3)
+        ]
+        cls.recipes = []
+        for i, amounts in enumerate(({0: 10, 1: 20}, {1: 5, 2: 7})):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/test.png', cooking_time=10)
+            recipe.tags.set([cls.tag])
+            AddAmount.objects.bulk_create(
+                AddAmount(recipe=recipe, ingredients=cls.ingredients[index],
+                          amount=amount)
+                for index, amount in amounts.items()
+            )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def cart(self, user, recipe, method='post'):
+        response = getattr(self.client_for(user), method)(
+            f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertIn(response.status_code, (201, 204))
+
+    def totals(self, user):
+        return {
+            ingredient_id - self.ingredients[0].id: total
+            for ingredient_id, total in ShoppingCartTotal.objects.filter(
+                user=user).values_list('ingredient_id', 'total')
+        }
+
+    def assert_rebuild_agrees(self):
+        call_command('rebuild_cart_totals', '--check', stdout=StringIO())
+
+    def test_add_and_remove(self):
+        reader = self.readers[0]
+        self.cart(reader, self.recipes[0])
+        self.assertEqual(self.totals(reader), {0: 10, 1: 20})
+        self.cart(reader, self.recipes[1])
+        self.assertEqual(self.totals(reader), {0: 10, 1: 25, 2: 7})
+        self.assert_rebuild_agrees()
+        self.cart(reader, self.recipes[0], 'delete')
+        self.assertEqual(self.totals(reader), {1: 5, 2: 7})
+        self.assertEqual(self.totals(self.readers[1]), {})
+        self.assert_rebuild_agrees()
+
+    def test_recipe_edit_updates_carts(self):
+        for reader in self.readers:
+            self.cart(reader, self.recipes[0])
+            self.cart(reader, self.recipes[1])
+        response = self.client_for(self.author).patch(
+            f'/api/recipes/{self.recipes[0].id}/', {
+                'ingredients': [
+                    {'id': self.ingredients[1].id, 'amount': 1},
+                    {'id': self.ingredients[2].id, 'amount': 3},
+                ],
+                'tags': [self.tag.id],
+                'cooking_time': 10,
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        for reader in self.readers:
+            self.assertEqual(self.totals(reader), {1: 6, 2: 10})
+        self.assert_rebuild_agrees()
+
+    def test_recipe_delete_updates_carts(self):
+        for reader in self.readers:
+            self.cart(reader, self.recipes[0])
+        self.cart(self.readers[0], self.recipes[1])
+        response = self.client_for(self.author).delete(
+            f'/api/recipes/{self.recipes[0].id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.totals(self.readers[0]), {1: 5, 2: 7})
+        self.assertEqual(self.totals(self.readers[1]), {})
+        self.assert_rebuild_agrees()
+
+    def test_deletes_outside_api_update_carts(self):
+        for reader in self.readers:
+            self.cart(reader, self.recipes[0])
+            self.cart(reader, self.recipes[1])
+        Recipe.objects.filter(pk=self.recipes[0].pk).delete()
+        self.assertEqual(self.totals(self.readers[0]), {1: 5, 2: 7})
+        self.assert_rebuild_agrees()
+        ShoppingCart.objects.get(
+            user=self.readers[0], recipe=self.recipes[1]).delete()
+        self.assertEqual(self.totals(self.readers[0]), {})
+        ShoppingCart.objects.filter(user=self.readers[1]).delete()
+        self.assertEqual(self.totals(self.readers[1]), {})
+        self.assert_rebuild_agrees()
+
+    def test_author_delete_updates_carts(self):
+        self.cart(self.readers[0], self.recipes[0])
+        self.author.delete()
+        self.assertEqual(self.totals(self.readers[0]), {})
+        self.assert_rebuild_agrees()
+
+    def test_admin_cart_and_amount_edits_update_carts(self):
+        self.cart(self.readers[0], self.recipes[0])
+        cart = ShoppingCart.objects.get(user=self.readers[0])
+        cart.recipe = self.recipes[1]
+        cart.save()
+        self.assertEqual(self.totals(self.readers[0]), {1: 5, 2: 7})
+        ShoppingCart.objects.create(
+            user=self.readers[1], recipe=self.recipes[1])
+        self.assertEqual(self.totals(self.readers[1]), {1: 5, 2: 7})
+        admin = site._registry[AddAmount]
+        request = RequestFactory().post('/admin/')
+        amount = AddAmount.objects.get(
+            recipe=self.recipes[1], ingredients=self.ingredients[2])
+        amount.amount = 9
+        admin.save_model(request, amount, None, change=True)
+        self.assertEqual(self.totals(self.readers[1]), {1: 5, 2: 9})
+        admin.delete_queryset(request, AddAmount.objects.filter(
+            recipe=self.recipes[1], ingredients=self.ingredients[1]))
+        self.assertEqual(self.totals(self.readers[0]), {2: 9})
+        self.assert_rebuild_agrees()
+
+    def test_rebuild_detects_drift(self):
+        self.cart(self.readers[0], self.recipes[0])
+        ShoppingCartTotal.objects.filter(user=self.readers[0]).update(total=1)
+        with self.assertRaises(CommandError):
+            self.assert_rebuild_agrees()
+        call_command('rebuild_cart_totals', stdout=StringIO())
+        self.assertEqual(self.totals(self.readers[0]), {0: 10, 1: 20})
@@ -0,0 +1,55 @@
+from unittest import skipIf, skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import AddAmount, Ingredient, Recipe
+from users.models import User
+
+
+class RecipeSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@foodgram.ru')
+        ingredient = Ingredient.objects.create(
+            name='картофель', measurement_unit='г')
+        cls.recipes = []
+        for name, text in (('Пирог с яблоками', 'Испечь в духовке'),
+                           ('Яблочный компот', 'Сварить яблоки'),
+                           ('Запеканка', 'Смешать и запечь')):
+            cls.recipes.append(Recipe.objects.create(
+                author=author, name=name, text=text,
+                image='recipes/test.png', cooking_time=10))
+        AddAmount.objects.create(
+            recipe=cls.recipes[2], ingredients=ingredient, amount=100)
+        Recipe.objects.all().update_search_vector()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, terms):
+        response = self.client.get('/api/recipes/', {'search': terms})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def ids(self, *indexes):
+        return [self.recipes[index].id for index in indexes]
+
+    @skipIf(connection.vendor == 'postgresql', 'regex fallback')
+    def test_regex_fallback_matches_name(self):
+        self.assertEqual(self.search('пирог'), self.ids(0))
+        self.assertEqual(self.search('картофель'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+    def test_word_forms_are_ranked(self):
+        self.assertEqual(self.search('яблоко'), self.ids(0, 1))
+
+    @skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+    def test_ingredient_names_are_searchable(self):
+        self.assertEqual(self.search('картофель'), self.ids(2))
+        self.assertEqual(self.search('свёкла'), [])
@@ -0,0 +1,86 @@
+import csv
+import io
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import utils
+from recipes.models import Ingredient, ShoppingCartTotal
+from users.models import User
+
+
+@override_settings(
+    THROTTLE_STORE={'BACKEND': 'api.throttling.DummyCounterStore'})
+class ShoppingCartDownloadTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@foodgram.ru')
+        for name, total in (('соль', 5), ('мука', 300)):
+            ShoppingCartTotal.objects.create(
+                user=cls.user, total=total,
+                ingredient=Ingredient.objects.create(
+                    name=name, measurement_unit='г'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, file_format=None, **headers):
+        params = {'format': file_format} if file_format else {}
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', params, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_txt(self):
+        response, content = self.download('txt')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertIn('shopping_cart.txt', response['Content-Disposition'])
+        self.assertEqual(content.decode(), 'мука - 300 г\nсоль - 5 г')
+
+    def test_csv(self):
+        response, content = self.download('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[1:], [['мука', '300', 'г'], ['соль', '5', 'г']])
+
+    def test_pdf(self):
+        response, content = self.download('pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+
+    def test_accept_header_does_not_change_format(self):
+        response, content = self.download(HTTP_ACCEPT='application/json')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertEqual(content.decode(), 'мука - 300 г\nсоль - 5 г')
+
+    def test_errors_are_json(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'xls'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', response.json())
+        self.client.force_authenticate(None)
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'pdf'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(
+            set(response.json()), {'detail'})
+
+    def test_rendered_file_is_cached_until_cart_changes(self):
+        with mock.patch.dict(utils.RENDERERS, txt=mock.Mock(
+                wraps=utils.render_txt)) as renderers:
+            self.download('txt')
+            _, content = self.download('txt')
+            self.assertEqual(renderers['txt'].call_count, 1)
+            ShoppingCartTotal.objects.filter(
+                ingredient__name='соль').update(total=7)
+            _, content = self.download('txt')
+            self.assertEqual(renderers['txt'].call_count, 2)
+        self.assertEqual(content.decode(), 'мука - 300 г\nсоль - 7 г')
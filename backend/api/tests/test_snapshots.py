@@ -0,0 +1,85 @@
+import gzip
+import json
+
+import brotli
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Tag
+
+
+class SnapshotTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#000001', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url, **headers):
+        return self.client.get(url, **headers)
+
+    def test_etag_returns_not_modified(self):
+        response = self.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH=f'"other", {etag}')
+        self.assertEqual(response.status_code, 304)
+        response = self.get('/api/tags/', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_encoding_negotiation(self):
+        for encoding, decompress in (('br', brotli.decompress),
+                                     ('gzip', gzip.decompress)):
+            response = self.get(
+                '/api/ingredients/', HTTP_ACCEPT_ENCODING=f'{encoding}, x')
+            self.assertEqual(response['Content-Encoding'], encoding)
+            self.assertIn('Accept-Encoding', response['Vary'])
+            data = json.loads(decompress(response.content))
+            self.assertEqual(data[0]['name'], 'соль')
+        response = self.get('/api/ingredients/', HTTP_ACCEPT_ENCODING='')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(response.content)[0]['name'], 'соль')
+
+    def test_encoding_quality_values(self):
+        for header, encoding in (('gzip, br;q=0', 'gzip'),
+                                 ('br;q=0.5, gzip;q=0.8', 'gzip'),
+                                 ('gzip;q=0.5, *', 'br'),
+                                 ('*;q=0, gzip', 'gzip')):
+            response = self.get(
+                '/api/ingredients/', HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(response['Content-Encoding'], encoding, header)
+        response = self.get(
+            '/api/ingredients/', HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_tag_save_invalidates_snapshot(self):
+        etag = self.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Обед'
+            self.tag.save()
+        response = self.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)[0]['name'], 'Обед')
+
+    def test_ingredient_save_invalidates_snapshot(self):
+        etag = self.get('/api/ingredients/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='перец', measurement_unit='г')
+        response = self.get('/api/ingredients/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['name'] for item in json.loads(response.content)],
+            ['перец', 'соль'])
@@ -0,0 +1,93 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.throttling import (AnonRateThrottle, ScopedRateThrottle,
+                            SQLiteCounterStore)
+from users.models import User
+
+LOCAL_THROTTLE_STORE = {
+    'BACKEND': 'api.throttling.CacheCounterStore',
+    'OPTIONS': {'alias': 'default'},
+}
+
+
+class LimitedThrottle(AnonRateThrottle):
+    rate = '2/min'
+
+
+@override_settings(THROTTLE_STORE=LOCAL_THROTTLE_STORE)
+class CounterRateThrottleTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.request = APIRequestFactory().get('/api/tags/')
+        self.request.user = mock.Mock(is_authenticated=False)
+
+    def allow(self, now):
+        throttle = LimitedThrottle()
+        throttle.timer = lambda: now
+        return throttle.allow_request(self.request, None), throttle
+
+    @override_settings(THROTTLE_WINDOW='fixed')
+    def test_fixed_window(self):
+        self.assertTrue(self.allow(60)[0])
+        self.assertTrue(self.allow(70)[0])
+        allowed, throttle = self.allow(80)
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 40)
+        self.assertTrue(self.allow(120)[0])
+
+    @override_settings(THROTTLE_WINDOW='sliding')
+    def test_sliding_window_counts_previous_window(self):
+        self.assertTrue(self.allow(110)[0])
+        self.assertTrue(self.allow(115)[0])
+        allowed, throttle = self.allow(125)
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 25)
+        self.assertTrue(self.allow(150)[0])
+        self.assertFalse(self.allow(151)[0])
+
+
+class SQLiteCounterStoreTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SQLiteCounterStore(
+            os.path.join(directory.name, 'throttle.sqlite3'))
+
+    def test_incr_and_expire(self):
+        self.assertEqual(self.store.incr('key', 60), 1)
+        self.assertEqual(self.store.incr('key', 60), 2)
+        self.store.decr('key')
+        self.assertEqual(self.store.get('key'), 1)
+        self.assertEqual(self.store.get('other'), 0)
+        with mock.patch('api.throttling.time.time', return_value=1e12):
+            self.assertEqual(self.store.get('key'), 0)
+            self.assertEqual(self.store.incr('key', 60), 1)
+
+
+@override_settings(THROTTLE_STORE=LOCAL_THROTTLE_STORE)
+class ScopedThrottleTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(
+            username='reader', email='reader@foodgram.ru'))
+
+    def test_download_shopping_cart_has_own_rate(self):
+        rates = dict(ScopedRateThrottle.THROTTLE_RATES,
+                     download_shopping_cart='1/hour')
+        with mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', rates):
+            first = self.client.get('/api/recipes/download_shopping_cart/')
+            second = self.client.get('/api/recipes/download_shopping_cart/')
+            tags = self.client.get('/api/tags/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 429)
+        self.assertEqual(tags.status_code, 200)
@@ -0,0 +1,156 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework import throttling
+
+
+class CacheCounterStore:
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def incr(self, key, timeout):
+        self.cache.add(key, 0, timeout)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, timeout)
+            return 1
+
+    def decr(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+    def get(self, key):
+        return self.cache.get(key, 0)
+
+
+class DummyCounterStore:
+
+    def incr(self, key, timeout):
+        return 1
+
+    def decr(self, key):
+        pass
+
+    def get(self, key):
+        return 0
+
+
+class SQLiteCounterStore:
+    cleanup_probability = 0.001
+
+    def __init__(self, path, timeout=5):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def get_connection(self):
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS counters ('
+                'key TEXT PRIMARY KEY, '
+                'value INTEGER NOT NULL, '
+                'expires REAL NOT NULL)'
+            )
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def incr(self, key, timeout):
+        connection = self.get_connection()
+        now = time.time()
+        if random.random() < self.cleanup_probability:
+            connection.execute(
+                'DELETE FROM counters WHERE expires < ?', (now,))
+        return connection.execute(
+            'INSERT INTO counters (key, value, expires) VALUES (?, 1, ?) '
+            'ON CONFLICT(key) DO UPDATE SET '
+            'value = CASE WHEN expires < ? THEN 1 ELSE value + 1 END, '
+            'expires = CASE WHEN expires < ? THEN excluded.expires '
+            'ELSE expires END '
+            'RETURNING value',
+            (key, now + timeout, now, now)
+        ).fetchone()[0]
+
+    def decr(self, key):
+        self.get_connection().execute(
+            'UPDATE counters SET value = value - 1 WHERE key = ?', (key,))
+
+    def get(self, key):
+        row = self.get_connection().execute(
+            'SELECT value FROM counters WHERE key = ? AND expires >= ?',
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+
+@lru_cache(maxsize=None)
+def get_counter_store():
+    store = settings.THROTTLE_STORE
+    return import_string(store['BACKEND'])(**store.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def reset_counter_store(setting, **kwargs):
+    if setting == 'THROTTLE_STORE':
+        get_counter_store.cache_clear()
+
+
+class CounterRateThrottle(throttling.SimpleRateThrottle):
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        store = get_counter_store()
+        window, elapsed = divmod(self.timer(), self.duration)
+        window = int(window)
+        key = f'{self.key}_{window}'
+        self.current = store.incr(key, self.duration * 2)
+        self.previous = 0
+        if settings.THROTTLE_WINDOW == 'sliding':
+            self.previous = store.get(f'{self.key}_{window - 1}')
+        self.elapsed = elapsed
+        weight = 1 - elapsed / self.duration
+        if self.current + self.previous * weight <= self.num_requests:
+            return True
+        store.decr(key)
+        self.current -= 1
+        return self.throttle_failure()
+
+    def wait(self):
+        remaining = self.duration - self.elapsed
+        if not self.previous or self.current >= self.num_requests:
+            return remaining
+        decay = self.duration * (
+            1 - (self.num_requests - self.current - 1) / self.previous)
+        return min(max(decay - self.elapsed, 0), remaining)
+
+
+class UserRateThrottle(throttling.UserRateThrottle, CounterRateThrottle):
+    pass
+
+
+class AnonRateThrottle(throttling.AnonRateThrottle, CounterRateThrottle):
+    pass
+
+
+class ScopedRateThrottle(throttling.ScopedRateThrottle, CounterRateThrottle):
+    pass
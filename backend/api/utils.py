@@ -1,20 +1,112 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import csv
+import hashlib
+import io
+import os
+from functools import lru_cache
 
-from recipes.models import AddAmount
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.http import FileResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import serializers
 
+from recipes.models import ShoppingCartTotal
 
-def download_txt_ingredients(request):
-    ingredients = AddAmount.objects.filter(
-        recipe__cart__user=request.user).values(
-        'ingredients__name', 'ingredients__measurement_unit'
-    ).annotate(total=Sum('amount'))
-    shopping_cart = '\n'.join([
-        f'{ingredient["ingredients__name"]} - {ingredient["total"]} '
-        f'{ingredient["ingredients__measurement_unit"]}'
+FONT_NAME = 'Handicraft'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'data', 'Handicraft.ttf')
+SHOPPING_CART_KEY = 'shopping_cart:{}:{}:{}'
+RECIPES_LIMIT_FIELD = serializers.IntegerField(min_value=0)
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+    return FONT_NAME
+
+
+def get_shopping_cart(user):
+    return list(ShoppingCartTotal.objects.filter(user=user).values(
+        'total',
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+    ).order_by('name'))
+
+
+def render_txt(ingredients):
+    return '\n'.join([
+        f'{ingredient["name"]} - {ingredient["total"]} '
+        f'{ingredient["measurement_unit"]}'
         for ingredient in ingredients
-    ])
-    filename = 'shopping_cart.txt'
-    response = HttpResponse(shopping_cart, content_type='text/plain')
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    return response
+    ]).encode('utf-8')
+
+
+def render_csv(ingredients):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for ingredient in ingredients:
+        writer.writerow((ingredient['name'],
+                         ingredient['total'],
+                         ingredient['measurement_unit']))
+    return buffer.getvalue().encode('utf-8')
+
+
+def render_pdf(ingredients):
+    font = register_font()
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    page.setFont(font, 24)
+    page.drawString(50, height - 60, 'Список покупок')
+    page.setFont(font, 14)
+    y = height - 100
+    for ingredient in ingredients:
+        if y < 50:
+            page.showPage()
+            page.setFont(font, 14)
+            y = height - 60
+        page.drawString(
+            60, y,
+            f'{ingredient["name"]} - {ingredient["total"]} '
+            f'{ingredient["measurement_unit"]}'
+        )
+        y -= 22
+    page.save()
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'pdf': render_pdf,
+}
+
+
+def download_ingredients(request, file_format):
+    ingredients = get_shopping_cart(request.user)
+    digest = hashlib.sha256(repr(ingredients).encode('utf-8')).hexdigest()
+    key = SHOPPING_CART_KEY.format(request.user.id, file_format, digest)
+    content = cache.get(key)
+    if content is None:
+        content = RENDERERS[file_format](ingredients)
+        cache.set(key, content)
+    return FileResponse(
+        io.BytesIO(content),
+        as_attachment=True,
+        filename=f'shopping_cart.{file_format}',
+        content_type=request.accepted_renderer.media_type,
+    )
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return settings.SUBSCRIPTION_RECIPES_LIMIT
+    try:
+        return RECIPES_LIMIT_FIELD.run_validation(recipes_limit)
+    except serializers.ValidationError as error:
+        raise serializers.ValidationError({'recipes_limit': error.detail})
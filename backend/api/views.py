@@ -1,26 +1,42 @@
+from collections import defaultdict
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import filters, status, viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (SAFE_METHODS, AllowAny,
-                                        IsAuthenticated,
+                                        IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            ShoppingCart, ShoppingCartTotal, Tag, lock_users)
 from users.models import Subscription, User
-from .filters import IngredientSearchFilter, RecipeFilter
-from .mixins import ListRetrieveViewSet, ListViewSet
-from .pagination import FoodGramPagination
-from .permissions import IsAdminOrReadOnly, IsAuthorOnly
+from .filters import (IngredientSearchFilter, RecipeFilter,
+                      RecipeOrderingFilter, RecipeSearchFilter)
+from .mixins import (AnonymousCacheMixin, AsyncReadMixin,
+                     ListRetrieveViewSet, ListViewSet, get_cache_stats)
+from .pagination import (FeedPagination, FoodGramPagination,
+                         RecipePagination)
+from .negotiation import FileFormatNegotiation
+from .permissions import IsAdminOrReadOnly
+from .renderers import CSVRenderer, PDFRenderer, TXTRenderer
+from .search import ingredient_index
 from .serializers import (AccountSerializer, CustomUserSerializer,
                           FavoriteSerializer, IngredientSerializer,
-                          RecipeListRetrieveSerializer,
+                          RecipeBatchSerializer, RecipeListRetrieveSerializer,
                           RecipeManipulationSerializer, ShoppingCartSerializer,
-                          SubscriptionSerializer, TagSerializer)
-from .utils import download_txt_ingredients
+                          SubscriptionListSerializer, SubscriptionSerializer,
+                          TagSerializer, aget_followed_ids)
+from .snapshots import asnapshot_response, snapshot_response
+from .utils import download_ingredients, get_recipes_limit
 
 
 class CustomUserViewSet(UserViewSet):
@@ -40,6 +56,8 @@ class CustomUserViewSet(UserViewSet):
     )
     def me(self, request):
         user = request.user
+        if request.method in SAFE_METHODS:
+            return Response(self.get_serializer(user).data)
         serializer = self.get_serializer(user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -48,15 +66,46 @@ class CustomUserViewSet(UserViewSet):
             status=status.HTTP_200_OK)
 
 
-class SubscriptionViewSet(ListViewSet):
-    queryset = Subscription.objects.all()
-    serializer_class = SubscriptionSerializer
-    permission_classes = (IsAuthorOnly,)
+class SubscriptionViewSet(AsyncReadMixin, ListViewSet):
+    queryset = User.objects.all()
+    serializer_class = SubscriptionListSerializer
+    permission_classes = (IsAuthenticated,)
     pagination_class = FoodGramPagination
     http_method_names = ('get', )
 
     def get_queryset(self):
-        return Subscription.objects.filter(user=self.request.user)
+        return User.objects.filter(
+            following__user=self.request.user
+        ).annotate(
+            recipes_count=Count('recipes', distinct=True)
+        ).order_by('following__id')
+
+    def get_latest_recipes(self, authors):
+        return Recipe.objects.latest_by_authors(
+            authors, get_recipes_limit(self.request))
+
+    def attach_latest_recipes(self, authors, recipes):
+        latest_recipes = defaultdict(list)
+        for recipe in recipes:
+            latest_recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = latest_recipes[author.id]
+        return authors
+
+    def paginate_queryset(self, queryset):
+        authors = super().paginate_queryset(queryset)
+        return self.attach_latest_recipes(
+            authors, self.get_latest_recipes(authors))
+
+    async def apaginate_queryset(self, queryset):
+        authors = await super().apaginate_queryset(queryset)
+        return self.attach_latest_recipes(authors, [
+            recipe async for recipe in self.get_latest_recipes(authors)
+        ])
+
+    async def aserialize(self, instance, many=False):
+        await aget_followed_ids(self.request)
+        return await super().aserialize(instance, many)
 
 
 class SubscriptionCreateDeleteAPIView(APIView):
@@ -65,6 +114,7 @@ class SubscriptionCreateDeleteAPIView(APIView):
     http_method_names = ('post', 'delete', )
 
     def post(self, request, id):
+        get_recipes_limit(request)
         data = {'user': request.user.id, 'author': id}
         serializer = SubscriptionSerializer(
             data=data,
@@ -81,46 +131,99 @@ class SubscriptionCreateDeleteAPIView(APIView):
         subscription = get_object_or_404(
             Subscription, user=user, author=author)
         if subscription:
-            subscription.delete()
+            with transaction.atomic():
+                subscription.delete()
             return Response('Вы отписались от автора.',
                             status=status.HTTP_204_NO_CONTENT)
         return Response('Вы не подписаны на пользователя',
                         status=status.HTTP_400_BAD_REQUEST)
 
 
-class IngredientViewSet(ListRetrieveViewSet):
+class IngredientViewSet(AsyncReadMixin, ListRetrieveViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filterset_class = IngredientSearchFilter
     search_fields = ('^name')
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return snapshot_response(
+                request, 'ingredients', self.get_queryset(),
+                self.get_serializer_class())
+        return Response(ingredient_index.search(name))
 
-class TagViewSet(ListRetrieveViewSet):
+    async def alist(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return await asnapshot_response(
+                request, 'ingredients', self.get_queryset(),
+                self.get_serializer_class())
+        return Response(await sync_to_async(ingredient_index.search)(name))
+
+
+class TagViewSet(AsyncReadMixin, ListRetrieveViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return snapshot_response(
+            request, 'tags', self.get_queryset(), self.get_serializer_class())
+
+    async def alist(self, request, *args, **kwargs):
+        return await asnapshot_response(
+            request, 'tags', self.get_queryset(), self.get_serializer_class())
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(AnonymousCacheMixin, AsyncReadMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
+    cache_name = 'recipes'
+    throttle_scope = None
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    pagination_class = FoodGramPagination
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
+    pagination_class = RecipePagination
+    filter_backends = (DjangoFilterBackend, RecipeSearchFilter,
+                       RecipeOrderingFilter,)
     filterset_class = RecipeFilter
-    filterset_fields = ('tags', 'author',
+    filterset_fields = ('tags', 'tags_mode', 'author',
                         'is_favorited', 'is_in_shopping_cart',)
     search_fields = ('$name', )
+    ordering_fields = ('pub_date', 'favorites_count',)
     http_method_names = ('get', 'post', 'patch', 'delete',)
 
+    def get_queryset(self):
+        if self.request.method in SAFE_METHODS:
+            return Recipe.objects.with_related().with_user_flags(
+                self.request.user)
+        return Recipe.objects.all()
+
     def get_serializer_class(self, *args, **kwargs):
         if self.request.method in SAFE_METHODS:
             return RecipeListRetrieveSerializer
         return RecipeManipulationSerializer
 
+    async def aserialize(self, instance, many=False):
+        serializer = self.get_serializer(instance, many=many)
+        if many:
+            return await serializer.child.ato_representation_many(
+                list(instance))
+        return (await serializer.ato_representation_many([instance]))[0]
+
+    def get_throttles(self):
+        if self.action == 'create':
+            self.throttle_scope = 'recipe_create'
+        return super().get_throttles()
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        FeedEntry.objects.fan_out(recipe)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
 
     def favorite_adding(self, request, recipe):
         data = {'user': request.user.id, 'recipe': recipe}
@@ -135,8 +238,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def delete_from_favorit(self, request, recipe):
         favorite = Favorite.objects.filter(user=request.user,
                                            recipe=recipe)
-        if favorite.exists():
-            favorite.delete()
+        with transaction.atomic():
+            deleted, _ = favorite.delete()
+            if deleted:
+                Recipe.objects.filter(pk=recipe).update(
+                    favorites_count=F('favorites_count') - deleted)
+        if deleted:
             return Response(
                 'Рецепт удален из избранного.',
                 status=status.HTTP_204_NO_CONTENT)
@@ -156,13 +263,107 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.favorite_adding(request, recipe.id)
         return self.delete_from_favorit(request, recipe.id)
 
+    def get_batch_ids(self, request):
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['recipes']))
+
+    @transaction.atomic
+    def batch_add(self, request, model, on_change):
+        ids = self.get_batch_ids(request)
+        lock_users([request.user.id])
+        found = set(Recipe.objects.filter(
+            id__in=ids).order_by().values_list('id', flat=True))
+        existing = set(model.objects.filter(
+            user=request.user, recipe__in=found
+        ).values_list('recipe_id', flat=True))
+        added = found - existing
+        if added:
+            model.objects.bulk_create(
+                [model(user=request.user, recipe_id=recipe_id)
+                 for recipe_id in added],
+                ignore_conflicts=True
+            )
+            on_change(added)
+        statuses = {recipe_id: 'exists' for recipe_id in existing}
+        statuses.update({recipe_id: 'added' for recipe_id in added})
+        return Response({'results': [
+            {'id': recipe_id, 'status': statuses.get(recipe_id, 'not_found')}
+            for recipe_id in ids
+        ]}, status=status.HTTP_200_OK)
+
+    @transaction.atomic
+    def batch_delete(self, request, model, on_change=None):
+        ids = self.get_batch_ids(request)
+        lock_users([request.user.id])
+        entries = model.objects.filter(user=request.user, recipe__in=ids)
+        removed = set(entries.values_list('recipe_id', flat=True))
+        if removed:
+            model.objects.filter(
+                user=request.user, recipe__in=removed).delete()
+            if on_change:
+                on_change(removed)
+        return Response({'results': [
+            {'id': recipe_id,
+             'status': 'removed' if recipe_id in removed else 'missing'}
+            for recipe_id in ids
+        ]}, status=status.HTTP_200_OK)
+
+    @action(
+        methods=('post', 'delete',),
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        def recount(recipe_ids):
+            Recipe.objects.filter(id__in=recipe_ids).recount_favorites()
+
+        if request.method == 'POST':
+            return self.batch_add(request, Favorite, recount)
+        return self.batch_delete(request, Favorite, recount)
+
+    @action(methods=('GET',),
+            detail=False,
+            url_path='feed',
+            pagination_class=FeedPagination,
+            permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        user = request.user
+        sources = [(FeedEntry.objects.filter(user=user), 'recipe_id')]
+        authors = User.objects.filter(
+            following__user=user,
+            followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values('id')
+        if authors.exists():
+            sources.append((Recipe.objects.filter(author__in=authors), 'id'))
+        recipe_ids = self.paginator.paginate_positions(sources, request)
+        recipes = Recipe.objects.with_related().with_user_flags(
+            user).in_bulk(recipe_ids)
+        serializer = RecipeListRetrieveSerializer(
+            [recipes[recipe_id] for recipe_id in recipe_ids],
+            many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=('GET',),
+            detail=False,
+            url_path='cache_stats',
+            permission_classes=(IsAdminUser,))
+    def cache_stats(self, request):
+        return Response(get_cache_stats(self.cache_name))
+
     @action(methods=('GET',),
             detail=False,
             url_path='download_shopping_cart',
             serializer_class=ShoppingCartSerializer,
-            permission_classes=(IsAuthorOnly,))
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=(TXTRenderer, CSVRenderer, PDFRenderer,),
+            content_negotiation_class=FileFormatNegotiation,
+            throttle_scope='download_shopping_cart')
     def download_shopping_cart(self, request):
-        return download_txt_ingredients(request)
+        return download_ingredients(
+            request, request.accepted_renderer.format)
 
     def add_to_shopping_cart(self, request, recipe):
         data = {'user': request.user.id, 'recipe': recipe}
@@ -177,8 +378,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def delete_from_shopping_cart(self, request, recipe):
         cart = ShoppingCart.objects.filter(user=request.user,
                                            recipe=recipe)
-        if cart.exists():
-            cart.delete()
+        with transaction.atomic():
+            deleted, _ = cart.delete()
+        if deleted:
             return Response(
                 'Рецепт удален из списка покупок.',
                 status=status.HTTP_204_NO_CONTENT)
@@ -195,3 +397,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if request.method == 'POST':
             return self.add_to_shopping_cart(request, recipe.id)
         return self.delete_from_shopping_cart(request, recipe.id)
+
+    @action(
+        methods=('post', 'delete',),
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        if request.method == 'POST':
+            return self.batch_add(
+                request, ShoppingCart,
+                partial(ShoppingCartTotal.objects.add_recipes,
+                        [request.user.id]))
+        return self.batch_delete(request, ShoppingCart)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -16,6 +17,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -29,6 +31,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -104,16 +107,19 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachingTokenAuthentication',
     ],
 
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+        'api.throttling.UserRateThrottle',
+        'api.throttling.AnonRateThrottle',
+        'api.throttling.ScopedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'user': '10000/day',
         'anon': '1000/day',
+        'download_shopping_cart': '30/hour',
+        'recipe_create': '60/hour',
     },
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.FoodGramPagination',
     'PAGE_SIZE': 6,
@@ -122,6 +128,48 @@ REST_FRAMEWORK = {
     ],
 }
 
+THROTTLE_WINDOW = os.getenv('THROTTLE_WINDOW', default='sliding')
+
+THROTTLE_STORE = {
+    'BACKEND': 'api.throttling.SQLiteCounterStore',
+    'OPTIONS': {
+        'path': os.getenv(
+            'THROTTLE_DB_PATH',
+            default=os.path.join(tempfile.gettempdir(),
+                                 'foodgram_throttle.sqlite3')),
+    },
+}
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+    }
+    THROTTLE_STORE = {
+        'BACKEND': 'api.throttling.CacheCounterStore',
+        'OPTIONS': {'alias': 'throttle'},
+    }
+
+TEST_RUNNER = 'foodgram.test_runner.TestRunner'
+
+INGREDIENTS_SEARCH_LIMIT = 50
+SUBSCRIPTION_RECIPES_LIMIT = 3
+
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_SIZE = 50
+
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', default='1') == '1'
+
+AUTH_TOKEN_CACHE_TIMEOUT = 60 * 5
+AUTH_TOKEN_LOCAL_CACHE_TIMEOUT = 10
+AUTH_TOKEN_LOCAL_CACHE_SIZE = 1024
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SEND_ACTIVATION_EMAIL': False,
@@ -144,4 +192,30 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS',
+                                         default=2))
+
+SQL_INSTRUMENTATION_SAMPLE_RATE = float(
+    os.getenv('SQL_INSTRUMENTATION_SAMPLE_RATE', default=0))
+SQL_INSTRUMENTATION_SLOWEST = 3
+SQL_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.middleware': {
+            'handlers': ['console'],
+            'level': os.getenv('SQL_INSTRUMENTATION_LOG_LEVEL',
+                               default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
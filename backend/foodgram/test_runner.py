@@ -0,0 +1,17 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_THROTTLE_STORE = {'BACKEND': 'api.throttling.DummyCounterStore'}
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.throttle_store = override_settings(
+            THROTTLE_STORE=TEST_THROTTLE_STORE)
+        self.throttle_store.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.throttle_store.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import AddAmount, Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .models import (AddAmount, Favorite, FeedEntry, Ingredient, Recipe,
+                     ShoppingCart, ShoppingCartTotal, Tag)
 
 
 @admin.register(Ingredient)
@@ -32,11 +33,25 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'author', 'text', 'in_favorites',)
     list_filter = ('author', 'name', 'tags',)
     search_fields = ('name', 'author', 'tags',)
+    readonly_fields = ('favorites_count',)
     empty_value_display = '---пусто---'
 
     @staticmethod
     def in_favorites(obj):
-        return obj.favorites.count()
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        with ShoppingCartTotal.objects.track_recipes([form.instance.pk]):
+            super().save_related(request, form, formsets, change)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        obj.save(update_fields=[
+            field.name for field in Recipe._meta.concrete_fields
+            if not field.primary_key
+            and field.name not in ('favorites_count', 'search_vector')
+        ])
 
 
 @admin.register(AddAmount)
@@ -47,6 +62,23 @@ class IngredientRecipeAdmin(admin.ModelAdmin):
     search_fields = ('ingredient_for_recipe__name',)
     empty_value_display = '---пусто---'
 
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.update(AddAmount.objects.filter(
+                pk=obj.pk).values_list('recipe_id', flat=True))
+        with ShoppingCartTotal.objects.track_recipes(recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with ShoppingCartTotal.objects.track_recipes([obj.recipe_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with ShoppingCartTotal.objects.track_recipes(
+                queryset.values_list('recipe_id', flat=True)):
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -64,3 +96,19 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_filter = ('user', 'recipe',)
     search_fields = ('user', 'recipe',)
     empty_value_display = '---пусто---'
+
+
+@admin.register(ShoppingCartTotal)
+class ShoppingCartTotalAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'ingredient', 'total',)
+    list_filter = ('user',)
+    search_fields = ('user__username', 'ingredient__name',)
+    empty_value_display = '---пусто---'
+
+
+@admin.register(FeedEntry)
+class FeedEntryAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'recipe', 'author', 'pub_date',)
+    list_filter = ('user',)
+    search_fields = ('user__username', 'recipe__name',)
+    empty_value_display = '---пусто---'
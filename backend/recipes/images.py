@@ -0,0 +1,81 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image, ImageOps
+
+from api.fragments import invalidate_recipe_fragments
+from api.snapshots import bump_version
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'small': 480,
+    'medium': 960,
+}
+
+_executor = None
+_executor_lock = Lock()
+
+
+def render_variants(path):
+    stem = os.path.splitext(path)[0]
+    variants = {}
+    with Image.open(path) as original:
+        image_format = original.format
+        has_exif = 'exif' in original.info
+        image = ImageOps.exif_transpose(original)
+    if has_exif:
+        image.save(path, format=image_format)
+    for name, size in VARIANTS.items():
+        variant = image.copy()
+        variant.thumbnail((size, size))
+        variant_path = f'{stem}_{name}.webp'
+        variant.save(variant_path, format='WEBP', quality=80)
+        variants[name] = os.path.basename(variant_path)
+    return variants
+
+
+def save_variants(recipe_id, name, variants):
+    folder = os.path.dirname(name)
+    if Recipe.objects.filter(pk=recipe_id, image=name).update(
+            image_variants={
+                variant: f'{folder}/{filename}'
+                for variant, filename in variants.items()
+            }):
+        bump_version('recipes')
+        invalidate_recipe_fragments([recipe_id])
+
+
+def on_variants_rendered(recipe_id, name, future):
+    try:
+        save_variants(recipe_id, name, future.result())
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS)
+        return _executor
+
+
+def process_recipe_image(recipe_id, name):
+    path = default_storage.path(name)
+    if not settings.IMAGE_PROCESSING_WORKERS:
+        save_variants(recipe_id, name, render_variants(path))
+        return
+    future = get_executor().submit(render_variants, path)
+    future.add_done_callback(
+        partial(on_variants_rendered, recipe_id, name))
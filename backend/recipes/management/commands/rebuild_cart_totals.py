@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import AddAmount, ShoppingCartTotal
+
+
+class Command(BaseCommand):
+    help = 'rebuilding or verifying shopping cart totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='only compare totals with shopping carts')
+
+    def get_expected(self):
+        return {
+            (row['recipe__cart__user'], row['ingredients']): row['total']
+            for row in AddAmount.objects.filter(
+                recipe__cart__isnull=False,
+                ingredients__isnull=False,
+            ).values('recipe__cart__user', 'ingredients').annotate(
+                total=Sum('amount')
+            ).order_by()
+        }
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = self.get_expected()
+            if options['check']:
+                actual = {
+                    (user_id, ingredient_id): total
+                    for user_id, ingredient_id, total in
+                    ShoppingCartTotal.objects.values_list(
+                        'user_id', 'ingredient_id', 'total')
+                }
+                mismatched = {
+                    key for key in expected.keys() | actual.keys()
+                    if expected.get(key) != actual.get(key)
+                }
+                if mismatched:
+                    raise CommandError(
+                        f'Расхождений в итогах: {len(mismatched)}')
+                self.stdout.write(f'Итоги совпадают: {len(expected)}')
+                return
+            ShoppingCartTotal.objects.all().delete()
+            ShoppingCartTotal.objects.bulk_create(
+                (ShoppingCartTotal(user_id=user_id,
+                                   ingredient_id=ingredient_id,
+                                   total=total)
+                 for (user_id, ingredient_id), total in expected.items()),
+                batch_size=1000
+            )
+        self.stdout.write(f'Итоги пересобраны: {len(expected)}')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FeedEntry
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    help = 'recounting followers and rebuilding subscription feeds'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            User.objects.update(followers_count=Coalesce(Subquery(
+                Subscription.objects.filter(
+                    author=OuterRef('pk')
+                ).order_by().values('author').annotate(
+                    count=Count('id')
+                ).values('count')
+            ), 0))
+            FeedEntry.objects.all().delete()
+            authors = User.objects.filter(followers_count__gt=0)
+            for author in authors.iterator():
+                FeedEntry.objects.backfill(
+                    Subscription.objects.filter(
+                        author=author).values_list('user_id', flat=True),
+                    author
+                )
+            count = FeedEntry.objects.count()
+        self.stdout.write(f'Записей в лентах: {count}')
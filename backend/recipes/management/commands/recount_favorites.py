@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe
+
+
+class Command(BaseCommand):
+    help = 'reconciling recipe favorites counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='only compare counters with favorites')
+
+    def handle(self, *args, **options):
+        actual = Coalesce(Subquery(
+            Favorite.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                count=Count('id')
+            ).values('count')
+        ), 0)
+        with transaction.atomic():
+            mismatched = Recipe.objects.annotate(actual=actual).exclude(
+                favorites_count=F('actual'))
+            if options['check']:
+                count = mismatched.count()
+                if count:
+                    raise CommandError(f'Расхождений в счётчиках: {count}')
+                self.stdout.write('Счётчики совпадают')
+                return
+            updated = Recipe.objects.filter(
+                pk__in=mismatched.values('pk')
+            ).update(favorites_count=actual)
+        self.stdout.write(f'Исправлено счётчиков: {updated}')
@@ -0,0 +1,123 @@
+import random
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.snapshots import bump_version
+from recipes.models import (AddAmount, Favorite, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+USERNAME_PREFIX = 'bench_'
+BENCHMARK_PASSWORD = 'bench-Passw0rd-2022'
+
+
+class Command(BaseCommand):
+    help = 'generating a deterministic dataset for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=100, type=int)
+        parser.add_argument('--recipes', default=1000, type=int)
+        parser.add_argument('--ingredients-per-recipe', default=8, type=int)
+        parser.add_argument('--favorites', default=20, type=int,
+                            help='favorites per user')
+        parser.add_argument('--carts', default=5, type=int,
+                            help='shopping cart recipes per user')
+        parser.add_argument('--subscriptions', default=10, type=int,
+                            help='subscriptions per user')
+        parser.add_argument('--seed', default=42, type=int)
+        parser.add_argument('--batch-size', default=1000, type=int)
+        parser.add_argument('--clear', action='store_true',
+                            help='remove previously generated data')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True))
+        tag_ids = list(Tag.objects.order_by('id').values_list('id', flat=True))
+        if not ingredient_ids or not tag_ids:
+            raise CommandError('Сначала выполните load_ingrs и load_tags.')
+        with transaction.atomic():
+            generated = User.objects.filter(
+                username__startswith=USERNAME_PREFIX)
+            if options['clear']:
+                generated.delete()
+            elif generated.exists():
+                raise CommandError(
+                    'Данные уже созданы, используйте --clear.')
+            password = make_password(BENCHMARK_PASSWORD)
+            users = User.objects.bulk_create((
+                User(
+                    username=f'{USERNAME_PREFIX}{i}',
+                    email=f'{USERNAME_PREFIX}{i}@foodgram.ru',
+                    first_name=f'Имя{i}',
+                    last_name=f'Фамилия{i}',
+                    password=password,
+                )
+                for i in range(options['users'])
+            ), batch_size=batch_size)
+            user_ids = [user.id for user in User.objects.filter(
+                username__startswith=USERNAME_PREFIX).order_by('id')]
+
+            recipes = Recipe.objects.bulk_create((
+                Recipe(
+                    author_id=rng.choice(user_ids),
+                    name=f'Рецепт {i}',
+                    text=f'Описание рецепта {i}',
+                    image='recipes/benchmark.png',
+                    cooking_time=rng.randint(5, 180),
+                )
+                for i in range(options['recipes'])
+            ), batch_size=batch_size)
+            recipes = list(Recipe.objects.filter(
+                author_id__in=user_ids).order_by('id'))
+            start = datetime(2022, 1, 1)
+            for i, recipe in enumerate(recipes):
+                recipe.pub_date = start + timedelta(minutes=i)
+            Recipe.objects.bulk_update(
+                recipes, ('pub_date',), batch_size=batch_size)
+            recipe_ids = [recipe.id for recipe in recipes]
+
+            AddAmount.objects.bulk_create((
+                AddAmount(recipe_id=recipe_id, ingredients_id=ingredient_id,
+                          amount=rng.randint(1, 500))
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(
+                    ingredient_ids, options['ingredients_per_recipe'])
+            ), batch_size=batch_size)
+            Recipe.tags.through.objects.bulk_create((
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in rng.sample(
+                    tag_ids, rng.randint(1, len(tag_ids)))
+            ), batch_size=batch_size)
+            for model, per_user in ((Favorite, options['favorites']),
+                                    (ShoppingCart, options['carts'])):
+                model.objects.bulk_create((
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in rng.sample(
+                        recipe_ids, min(per_user, len(recipe_ids)))
+                ), batch_size=batch_size, ignore_conflicts=True)
+            Subscription.objects.bulk_create((
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in rng.sample(
+                    user_ids, min(options['subscriptions'] + 1,
+                                  len(user_ids)))
+                if author_id != user_id
+            ), batch_size=batch_size, ignore_conflicts=True)
+
+            Recipe.objects.filter(pk__in=recipe_ids).update_search_vector()
+            call_command('recount_favorites', stdout=self.stdout)
+            call_command('rebuild_cart_totals', stdout=self.stdout)
+            call_command('rebuild_feeds', stdout=self.stdout)
+        bump_version('recipes')
+        self.stdout.write(
+            f'Создано пользователей: {len(users)}, '
+            f'рецептов: {len(recipe_ids)}'
+        )
@@ -0,0 +1,109 @@
+import csv
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.fragments import invalidate_recipe_fragments
+from api.snapshots import bump_version
+from recipes.models import Recipe, schedule_search_vector_update
+
+DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+
+
+class BulkLoadCommand(BaseCommand):
+    model = None
+    fields = ()
+    key_fields = ()
+    default_filename = None
+    snapshot_name = None
+    not_found_message = None
+    recipe_lookup = None
+    search_fields = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename', default=self.default_filename,
+                            nargs='?', type=str)
+        parser.add_argument('--batch-size', default=1000, type=int)
+
+    def read_rows(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith('.json'):
+                for item in json.load(f):
+                    yield tuple(item[field] for field in self.fields)
+            else:
+                for row in csv.reader(f):
+                    if row:
+                        yield tuple(row[:len(self.fields)])
+
+    def get_key(self, values):
+        return tuple(values[self.fields.index(field)]
+                     for field in self.key_fields)
+
+    def load(self, path, batch_size):
+        existing = {}
+        for item in self.model.objects.values_list('id', *self.fields):
+            existing[self.get_key(item[1:])] = item
+        created, updated = [], []
+        inserted = unchanged = 0
+        changed, renamed = [], []
+        seen = set()
+        for values in self.read_rows(path):
+            key = self.get_key(values)
+            if key in seen:
+                continue
+            seen.add(key)
+            current = existing.get(key)
+            if current is None:
+                created.append(self.model(**dict(zip(self.fields, values))))
+                inserted += 1
+            elif current[1:] != values:
+                updated.append(self.model(
+                    id=current[0], **dict(zip(self.fields, values))))
+                changed.append(current[0])
+                if any(current[1 + self.fields.index(field)]
+                       != values[self.fields.index(field)]
+                       for field in self.search_fields):
+                    renamed.append(current[0])
+            else:
+                unchanged += 1
+            if len(created) >= batch_size:
+                self.model.objects.bulk_create(created)
+                created = []
+            if len(updated) >= batch_size:
+                self.model.objects.bulk_update(updated, self.fields)
+                updated = []
+        self.model.objects.bulk_create(created)
+        self.model.objects.bulk_update(updated, self.fields)
+        return inserted, changed, renamed, unchanged
+
+    def get_recipe_ids(self, ids):
+        if not ids:
+            return []
+        return list(Recipe.objects.filter(**{
+            f'{self.recipe_lookup}__in': ids
+        }).values_list('id', flat=True).distinct())
+
+    def handle(self, *args, **options):
+        path = os.path.join(DATA_ROOT, options['filename'])
+        try:
+            with transaction.atomic():
+                inserted, changed, renamed, unchanged = self.load(
+                    path, options['batch_size'])
+                recipe_ids = self.get_recipe_ids(changed)
+                if renamed:
+                    schedule_search_vector_update(
+                        self.get_recipe_ids(renamed))
+        except FileNotFoundError:
+            raise CommandError(self.not_found_message)
+        if inserted or changed:
+            bump_version(self.snapshot_name)
+        if recipe_ids:
+            bump_version('recipes')
+            invalidate_recipe_fragments(recipe_ids)
+        self.stdout.write(
+            f'Добавлено: {inserted}, обновлено: {len(changed)}, '
+            f'без изменений: {unchanged}'
+        )
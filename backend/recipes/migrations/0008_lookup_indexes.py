@@ -0,0 +1,61 @@
+# Generated by Django 4.1.13 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+CREATE_INGREDIENT_NAME_INDEX = '''
+CREATE INDEX ingredient_name_pattern_idx
+ON recipes_ingredient (upper(name::text) text_pattern_ops)
+'''
+
+DROP_INGREDIENT_NAME_INDEX = (
+    'DROP INDEX IF EXISTS ingredient_name_pattern_idx'
+)
+
+
+def merge_duplicate_amounts(apps, schema_editor):
+    AddAmount = apps.get_model('recipes', 'AddAmount')
+    duplicates = AddAmount.objects.filter(
+        recipe__isnull=False, ingredients__isnull=False
+    ).values('recipe', 'ingredients').annotate(
+        count=models.Count('id'),
+        total=models.Sum('amount'),
+        first=models.Min('id'),
+    ).filter(count__gt=1).order_by()
+    for row in duplicates:
+        AddAmount.objects.filter(pk=row['first']).update(
+            amount=min(row['total'], 32767))
+        AddAmount.objects.filter(
+            recipe=row['recipe'], ingredients=row['ingredients']
+        ).exclude(pk=row['first']).delete()
+
+
+def create_ingredient_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INGREDIENT_NAME_INDEX)
+
+
+def drop_ingredient_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INGREDIENT_NAME_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_tags_tag_recipe_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.RunPython(
+            merge_duplicate_amounts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='addamount',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredients'), name='unique_recipe_ingredient'),
+        ),
+        migrations.RunPython(
+            create_ingredient_name_index, drop_ingredient_name_index),
+    ]
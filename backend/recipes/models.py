@@ -1,12 +1,20 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import Coalesce, RowNumber
 from django.urls import reverse
 
 from .validators import validate_not_empty
-from users.models import User
+from users.models import Subscription, TrackedFieldsMixin, User
 
 
-class Ingredient(models.Model):
+class Ingredient(TrackedFieldsMixin, models.Model):
     name = models.CharField(
         verbose_name='Название ингредиента',
         max_length=200
@@ -17,6 +25,8 @@ class Ingredient(models.Model):
         null=True
     )
 
+    tracked_fields = ('name',)
+
     class Meta:
         ordering = ['name']
         verbose_name = 'Ингредиент'
@@ -69,7 +79,94 @@ class Tag(models.Model):
         return f'{self.name}'
 
 
-class Recipe(models.Model):
+SEARCH_CONFIG = 'russian'
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('author').defer('search_vector')
+
+    def recount_favorites(self):
+        return self.update(favorites_count=Coalesce(models.Subquery(
+            Favorite.objects.filter(
+                recipe=models.OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                count=models.Count('id')
+            ).values('count')
+        ), 0))
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+        )
+
+    def latest_by_authors(self, authors, limit=None):
+        queryset = self.filter(author__in=authors)
+        if limit is None:
+            return queryset
+        ranked = queryset.order_by().annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=models.F('author_id'),
+                order_by=models.F('pub_date').desc(),
+            )
+        ).values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f'SELECT "id" FROM ({sql}) AS "ranked" '
+            f'WHERE "row_number" <= %s',
+            (*params, limit)
+        ))
+
+    def update_search_vector(self):
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        ingredient_names = AddAmount.objects.filter(
+            recipe=models.OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredients__name', ' ')
+        ).values('names')
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            + SearchVector(models.Subquery(ingredient_names),
+                           weight='C', config=SEARCH_CONFIG)
+        ))
+
+
+class PendingSearchVectors:
+
+    def __init__(self, recipe_ids):
+        self.recipe_ids = set(recipe_ids)
+
+    def __call__(self):
+        Recipe.objects.filter(
+            pk__in=self.recipe_ids).update_search_vector()
+
+
+def schedule_search_vector_update(recipe_ids):
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'pending_search_vectors', None)
+    if connection.in_atomic_block and any(
+            callback is pending
+            for _, callback, *_ in connection.run_on_commit):
+        pending.recipe_ids.update(recipe_ids)
+        return
+    pending = connection.pending_search_vectors = PendingSearchVectors(
+        recipe_ids)
+    transaction.on_commit(pending)
+
+
+class Recipe(TrackedFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -88,6 +185,12 @@ class Recipe(models.Model):
         'Изображение',
         upload_to='recipes/'
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание рецепта',
         help_text='Добавьте рецепт',
@@ -116,11 +219,33 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+    tracked_fields = ('name', 'text')
 
     class Meta:
         ordering = ['-pub_date', ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=('-favorites_count', '-pub_date'),
+                name='recipe_popularity_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -151,6 +276,12 @@ class AddAmount(models.Model):
     class Meta:
         verbose_name = 'Количество ингредиента для рецепта'
         verbose_name_plural = 'Количество ингредиента для рецептов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'ingredients'),
+                name='unique_recipe_ingredient'
+            )
+        ]
 
     def __str__(self) -> str:
         return f'{self.ingredients} - {self.amount}'
@@ -181,7 +312,7 @@ class Favorite(models.Model):
         ]
 
 
-class ShoppingCart(models.Model):
+class ShoppingCart(TrackedFieldsMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -195,6 +326,8 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт'
     )
 
+    tracked_fields = ('user_id', 'recipe_id')
+
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
@@ -204,3 +337,227 @@ class ShoppingCart(models.Model):
                 fields=['user', 'recipe'], name='unique_cart'
             )
         ]
+
+
+def lock_users(user_ids):
+    return list(User.objects.select_for_update().filter(
+        pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def get_recipe_amounts(recipes):
+    amounts = defaultdict(int)
+    for ingredient_id, amount in AddAmount.objects.filter(
+            recipe__in=recipes).values_list('ingredients_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def get_amounts_by_recipe(recipe_ids):
+    amounts = defaultdict(lambda: defaultdict(int))
+    for recipe_id, ingredient_id, amount in AddAmount.objects.filter(
+            recipe__in=recipe_ids).values_list(
+                'recipe_id', 'ingredients_id', 'amount'):
+        amounts[recipe_id][ingredient_id] += amount
+    return amounts
+
+
+def group_carts(carts):
+    recipes = defaultdict(list)
+    for user_id, recipe_id in carts:
+        recipes[user_id].append(recipe_id)
+    lock_users(recipes)
+    return recipes.items()
+
+
+class ShoppingCartTotalQuerySet(models.QuerySet):
+
+    def apply(self, user_ids, amounts):
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items() if amount
+        }
+        if not user_ids or not amounts:
+            return
+        rows = {
+            (row.user_id, row.ingredient_id): row
+            for row in self.select_for_update().filter(
+                user__in=user_ids, ingredient__in=amounts)
+        }
+        created, updated, removed = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, amount in amounts.items():
+                row = rows.get((user_id, ingredient_id))
+                if row is None:
+                    if amount > 0:
+                        created.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total=amount
+                        ))
+                    continue
+                row.total += amount
+                if row.total > 0:
+                    updated.append(row)
+                else:
+                    removed.append(row.id)
+        self.bulk_create(created)
+        self.bulk_update(updated, ('total',))
+        self.filter(id__in=removed).delete()
+
+    def add_recipes(self, user_ids, recipes):
+        self.apply(user_ids, get_recipe_amounts(recipes))
+
+    def remove_recipes(self, user_ids, recipes):
+        self.apply(user_ids, {
+            ingredient_id: -amount
+            for ingredient_id, amount in get_recipe_amounts(recipes).items()
+        })
+
+    @transaction.atomic
+    def add_carts(self, carts):
+        for user_id, recipe_ids in group_carts(carts):
+            self.add_recipes([user_id], recipe_ids)
+
+    @transaction.atomic
+    def remove_carts(self, carts):
+        for user_id, recipe_ids in group_carts(carts):
+            self.remove_recipes([user_id], recipe_ids)
+
+    @contextmanager
+    def track_recipes(self, recipe_ids):
+        with transaction.atomic():
+            recipe_ids = set(recipe_ids)
+            carts = list(ShoppingCart.objects.filter(
+                recipe__in=recipe_ids).values_list('user_id', 'recipe_id'))
+            lock_users({user_id for user_id, _ in carts})
+            before = get_amounts_by_recipe(recipe_ids)
+            yield
+            after = get_amounts_by_recipe(recipe_ids)
+            changes = defaultdict(lambda: defaultdict(int))
+            for user_id, recipe_id in carts:
+                old, new = before[recipe_id], after[recipe_id]
+                for ingredient_id in old.keys() | new.keys():
+                    changes[user_id][ingredient_id] += (
+                        new[ingredient_id] - old[ingredient_id])
+            for user_id, amounts in changes.items():
+                self.apply([user_id], amounts)
+
+    def add_recipe(self, user_ids, recipe):
+        self.add_recipes(user_ids, [recipe])
+
+    def remove_recipe(self, user_ids, recipe):
+        self.remove_recipes(user_ids, [recipe])
+
+
+class ShoppingCartTotal(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Ингредиент'
+    )
+    total = models.PositiveIntegerField(
+        verbose_name='Общее количество'
+    )
+
+    objects = ShoppingCartTotalQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+        db_table = 'cart_total'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'], name='unique_cart_total'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.ingredient} - {self.total}'
+
+
+class FeedEntryQuerySet(models.QuerySet):
+
+    def build_entries(self, user_ids, recipes):
+        return [
+            self.model(user_id=user_id, recipe_id=recipe_id,
+                       author_id=author_id, pub_date=pub_date)
+            for user_id in user_ids
+            for recipe_id, author_id, pub_date in recipes
+        ]
+
+    def fan_out(self, recipe):
+        if User.objects.filter(
+                pk=recipe.author_id,
+                followers_count__gt=settings.FEED_FANOUT_LIMIT).exists():
+            return
+        self.bulk_create(
+            self.build_entries(
+                Subscription.objects.filter(
+                    author=recipe.author_id
+                ).values_list('user_id', flat=True),
+                [(recipe.id, recipe.author_id, recipe.pub_date)]),
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+    def backfill(self, user_ids, author):
+        if author.followers_count > settings.FEED_FANOUT_LIMIT:
+            return
+        recipes = Recipe.objects.filter(author=author).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', 'author_id', 'pub_date')[
+            :settings.FEED_BACKFILL_SIZE]
+        self.bulk_create(
+            self.build_entries(user_ids, recipes),
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Читатель'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        db_table = 'feed'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx'
+            ),
+        ]
@@ -11,8 +11,10 @@ class UserAdmin(admin.ModelAdmin):
         'email',
         'role',
         'first_name',
-        'last_name'
+        'last_name',
+        'followers_count'
     )
+    readonly_fields = ('followers_count',)
     search_fields = ('username', 'email',)
 
 
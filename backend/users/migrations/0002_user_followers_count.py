@@ -0,0 +1,34 @@
+# Generated by Django 4.1.13 on 2026-10-18 18:43
+
+from django.db import migrations, models
+
+
+def count_followers(apps, schema_editor):
+    Subscription = apps.get_model('users', 'Subscription')
+    User = apps.get_model('users', 'User')
+    User.objects.update(followers_count=models.functions.Coalesce(
+        models.Subquery(
+            Subscription.objects.filter(
+                author=models.OuterRef('pk')
+            ).order_by().values('author').annotate(
+                count=models.Count('id')
+            ).values('count')
+        ),
+        0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписчиков'),
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
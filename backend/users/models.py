@@ -13,7 +13,28 @@ class UserRoles:
     )
 
 
-class User(AbstractUser):
+class TrackedFieldsMixin:
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_values = instance.get_tracked_values()
+        return instance
+
+    def get_tracked_values(self):
+        return {name: self.__dict__.get(name) for name in self.tracked_fields}
+
+    def tracked_fields_changed(self):
+        return (getattr(self, 'loaded_values', None)
+                != self.get_tracked_values())
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.loaded_values = self.get_tracked_values()
+
+
+class User(TrackedFieldsMixin, AbstractUser):
 
     email = models.EmailField(
         max_length=254,
@@ -46,6 +67,12 @@ class User(AbstractUser):
         max_length=150,
         verbose_name='Пароль'
     )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0
+    )
+
+    tracked_fields = ('email', 'username', 'first_name', 'last_name')
 
     class Meta:
         verbose_name = 'Пользователь',
@@ -55,6 +82,19 @@ class User(AbstractUser):
             UniqueConstraint(fields=['username', ], name='username')
         ]
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            kwargs['update_fields'] = [
+                name for name in update_fields if name != 'followers_count'
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def is_admin(self):
         return (self.role == UserRoles.ADMIN
@@ -65,7 +105,7 @@ class User(AbstractUser):
         return self.role == UserRoles.USER
 
 
-class Subscription(models.Model):
+class Subscription(TrackedFieldsMixin, models.Model):
     user = models.ForeignKey(
         User,
         verbose_name='подписчик',
@@ -82,6 +122,8 @@ class Subscription(models.Model):
         }
     )
 
+    tracked_fields = ('user_id', 'author_id')
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'